@@ -1,4 +1,5 @@
 CREATE EXTENSION IF NOT EXISTS vector;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 CREATE TYPE genre_type AS ENUM (
     'action',
@@ -47,83 +48,128 @@ CREATE TYPE genre_type AS ENUM (
     'western'
 );
 
-CREATE TABLE IF NOT EXISTS fixed_size_splitter_all_MiniLM_L6_v2 (
+-- Movie metadata is stored once in movies, chunk texts once per chunking
+-- strategy in chunks_<strategy>, and every <strategy>_<model> table only
+-- holds the chunk vectors (movie_id is kept there to group chunks by movie
+-- without a join).
+-- HNSW/IVFFlat indexes on feature_vector are managed by pg_vector_api/indexes.py
+-- and built once a table is populated.
+-- title_tsv/description_tsv with their GIN indexes and the trigram index on
+-- title serve the lexical side of hybrid search.
+
+CREATE TABLE IF NOT EXISTS movies (
     id SERIAL PRIMARY KEY,
-    title TEXT,
+    title TEXT NOT NULL,
     year INTEGER,
     genres genre_type ARRAY,
+    title_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', title)) STORED,
+    UNIQUE (title, year)
+);
+
+CREATE INDEX IF NOT EXISTS movies_year_idx ON movies (year);
+CREATE INDEX IF NOT EXISTS movies_genres_idx ON movies USING gin (genres);
+CREATE INDEX IF NOT EXISTS movies_title_tsv_idx ON movies USING gin (title_tsv);
+CREATE INDEX IF NOT EXISTS movies_title_trgm_idx ON movies USING gin (title gin_trgm_ops);
+
+CREATE TABLE IF NOT EXISTS chunks_fixed_size_splitter (
+    id SERIAL PRIMARY KEY,
+    movie_id INTEGER NOT NULL REFERENCES movies (id) ON DELETE CASCADE,
+    text_hash TEXT NOT NULL,
     description TEXT,
-    feature_vector VECTOR(384)
+    description_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED,
+    UNIQUE (movie_id, text_hash)
 );
 
-CREATE TABLE IF NOT EXISTS fixed_size_splitter_gtr_t5_base (
+CREATE INDEX IF NOT EXISTS chunks_fixed_size_splitter_description_tsv_idx ON chunks_fixed_size_splitter USING gin (description_tsv);
+
+CREATE TABLE IF NOT EXISTS chunks_recursive_splitter (
     id SERIAL PRIMARY KEY,
-    title TEXT,
-    year INTEGER,
-    feature_vector VECTOR(768),
+    movie_id INTEGER NOT NULL REFERENCES movies (id) ON DELETE CASCADE,
+    text_hash TEXT NOT NULL,
     description TEXT,
-    genres genre_type ARRAY
+    description_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED,
+    UNIQUE (movie_id, text_hash)
 );
 
-CREATE TABLE IF NOT EXISTS fixed_size_splitter_bert_base_nli_mean_tokens (
+CREATE INDEX IF NOT EXISTS chunks_recursive_splitter_description_tsv_idx ON chunks_recursive_splitter USING gin (description_tsv);
+
+CREATE TABLE IF NOT EXISTS chunks_semantic_splitter (
     id SERIAL PRIMARY KEY,
-    title TEXT,
-    year INTEGER,
-    genres genre_type ARRAY,
+    movie_id INTEGER NOT NULL REFERENCES movies (id) ON DELETE CASCADE,
+    text_hash TEXT NOT NULL,
     description TEXT,
+    description_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED,
+    UNIQUE (movie_id, text_hash)
+);
+
+CREATE INDEX IF NOT EXISTS chunks_semantic_splitter_description_tsv_idx ON chunks_semantic_splitter USING gin (description_tsv);
+
+CREATE TABLE IF NOT EXISTS fixed_size_splitter_all_MiniLM_L6_v2 (
+    chunk_id INTEGER PRIMARY KEY REFERENCES chunks_fixed_size_splitter (id) ON DELETE CASCADE,
+    movie_id INTEGER NOT NULL,
+    feature_vector VECTOR(384)
+);
+
+CREATE TABLE IF NOT EXISTS fixed_size_splitter_gtr_t5_base (
+    chunk_id INTEGER PRIMARY KEY REFERENCES chunks_fixed_size_splitter (id) ON DELETE CASCADE,
+    movie_id INTEGER NOT NULL,
+    feature_vector VECTOR(768)
+);
+
+CREATE TABLE IF NOT EXISTS fixed_size_splitter_bert_base_nli_mean_tokens (
+    chunk_id INTEGER PRIMARY KEY REFERENCES chunks_fixed_size_splitter (id) ON DELETE CASCADE,
+    movie_id INTEGER NOT NULL,
     feature_vector VECTOR(768)
 );
 
 CREATE TABLE IF NOT EXISTS recursive_splitter_all_MiniLM_L6_v2 (
-    id SERIAL PRIMARY KEY,
-    title TEXT,
-    year INTEGER,
-    genres genre_type ARRAY,
-    description TEXT,
+    chunk_id INTEGER PRIMARY KEY REFERENCES chunks_recursive_splitter (id) ON DELETE CASCADE,
+    movie_id INTEGER NOT NULL,
     feature_vector VECTOR(384)
 );
 
 CREATE TABLE IF NOT EXISTS recursive_splitter_gtr_t5_base (
-    id SERIAL PRIMARY KEY,
-    title TEXT,
-    year INTEGER,
-    genres genre_type ARRAY,
-    description TEXT,
+    chunk_id INTEGER PRIMARY KEY REFERENCES chunks_recursive_splitter (id) ON DELETE CASCADE,
+    movie_id INTEGER NOT NULL,
     feature_vector VECTOR(768)
 );
 
 CREATE TABLE IF NOT EXISTS recursive_splitter_bert_base_nli_mean_tokens (
-    id SERIAL PRIMARY KEY,
-    title TEXT,
-    year INTEGER,
-    genres genre_type ARRAY,
-    description TEXT,
+    chunk_id INTEGER PRIMARY KEY REFERENCES chunks_recursive_splitter (id) ON DELETE CASCADE,
+    movie_id INTEGER NOT NULL,
     feature_vector VECTOR(768)
 );
 
 CREATE TABLE IF NOT EXISTS semantic_splitter_all_MiniLM_L6_v2 (
-    id SERIAL PRIMARY KEY,
-    title TEXT,
-    year INTEGER,
-    genres genre_type ARRAY,
-    description TEXT,
+    chunk_id INTEGER PRIMARY KEY REFERENCES chunks_semantic_splitter (id) ON DELETE CASCADE,
+    movie_id INTEGER NOT NULL,
     feature_vector VECTOR(384)
 );
 
 CREATE TABLE IF NOT EXISTS semantic_splitter_gtr_t5_base (
-    id SERIAL PRIMARY KEY,
-    title TEXT,
-    year INTEGER,
-    genres genre_type ARRAY,
-    description TEXT,
+    chunk_id INTEGER PRIMARY KEY REFERENCES chunks_semantic_splitter (id) ON DELETE CASCADE,
+    movie_id INTEGER NOT NULL,
     feature_vector VECTOR(768)
 );
 
 CREATE TABLE IF NOT EXISTS semantic_splitter_bert_base_nli_mean_tokens (
-    id SERIAL PRIMARY KEY,
-    title TEXT,
-    year INTEGER,
-    genres genre_type ARRAY,
-    description TEXT,
+    chunk_id INTEGER PRIMARY KEY REFERENCES chunks_semantic_splitter (id) ON DELETE CASCADE,
+    movie_id INTEGER NOT NULL,
     feature_vector VECTOR(768)
 );
+
+CREATE TABLE IF NOT EXISTS population_checkpoints (
+    table_name TEXT PRIMARY KEY,
+    content_hash TEXT,
+    loaded_rows INTEGER DEFAULT 0,
+    total_rows INTEGER DEFAULT 0,
+    completed BOOLEAN DEFAULT FALSE,
+    updated_at TIMESTAMP DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS movie_hashes (
+    table_name TEXT,
+    movie_id INTEGER REFERENCES movies (id) ON DELETE CASCADE,
+    content_hash TEXT,
+    PRIMARY KEY (table_name, movie_id)
+);
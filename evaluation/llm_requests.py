@@ -44,7 +44,8 @@ def search_movies(
         query: str,
         metadata: dict,
         k: int,
-        min_similarity_score: float) -> dict:
+        min_similarity_score: float,
+        search_mode: str = 'vector') -> dict:
     url = f"{os.getenv('DB_API')}/search_movies"
     body = {
         "chunking_strategy": chunking_strategy,
@@ -52,7 +53,8 @@ def search_movies(
         "query": query,
         "metadata": metadata,
         "k": k,
-        "min_similarity_score": min_similarity_score
+        "min_similarity_score": min_similarity_score,
+        "search_mode": search_mode
     }
     try:
         response = requests.post(url, json=body)
@@ -63,3 +65,21 @@ def search_movies(
                 }
     except Exception as e:
         return {"error": f"An error occurred: {str(e)}"}
+
+
+def search_movies_batch(searches: list) -> dict:
+    """
+    searches is a list of dicts with the search_movies arguments,
+    results come back in the same order.
+    """
+    url = f"{os.getenv('DB_API')}/search_movies/batch"
+    body = {"queries": searches}
+    try:
+        response = requests.post(url, json=body)
+        if response.status_code == 200:
+            return response.json()
+        return {"error":
+                f"Request failed with status code {response.status_code}"
+                }
+    except Exception as e:
+        return {"error": f"An error occurred: {str(e)}"}
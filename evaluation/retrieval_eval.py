@@ -0,0 +1,196 @@
+"""
+Retrieval evaluation of the notebooks/retrieval-eval.ipynb pipeline as a
+script, with search latency recorded next to the retrieval metrics.
+
+--search vector   query only
+--search hybrid   LLM extracted metadata filters + vector search
+--search rrf      metadata filters + lexical/vector rank fusion (search_mode='hybrid')
+
+python retrieval_eval.py --search rrf --k 10
+writes retrieval_validation/gpt_evaluations_<search>_search.csv and
+retrieval_validation/metrics_<search>_search.csv
+"""
+import argparse
+import ast
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+from openai import OpenAI
+from tqdm import tqdm
+
+from llm_requests import extract_metadata, search_movies
+
+load_dotenv()
+
+CHUNKING_STRATEGIES = [
+    'fixed-size-splitter',
+    'recursive-splitter',
+    'semantic-splitter'
+    ]
+EMBEDDING_MODELS = [
+    'all-MiniLM-L6-v2',
+    'bert-base-nli-mean-tokens',
+    'gtr-t5-base'
+]
+SEARCH_MODES = {'vector': 'vector', 'hybrid': 'vector', 'rrf': 'hybrid'}
+MAX_ATTEMPTS = 3
+OUTPUT_DIR = 'retrieval_validation'
+
+
+def gpt_evaluate(client: OpenAI, search_query: str, search_results: list, k: int) -> list:
+    prompt = ""
+    cnt = 1
+    for res in search_results:
+        title, description = res['title'], res['description']
+        if title not in prompt and cnt <= k and len(description) > 20:
+            prompt += f"{cnt}. Title: {title}\nDescription: {description}\n\n"
+            cnt += 1
+    prompt = prompt.strip()
+
+    response = client.chat.completions.create(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": "You are a fair evaluator of movie search system."
+             "You will be provided a search query and search results with movies descriptions. "
+             "Your task is for each movie to return either 0 or 1 to indicate whether movie is relevant "
+             "and good reccomendation based on provided search query or not. Output format should be Python list "
+             "of 0s and 1s of length returned movies."},
+            {
+                "role": "user",
+                "content": f"""
+Search query: {search_query}\n\nOutput movies:
+{prompt}
+Provide evaluation list of length {k}.
+"""
+            },
+        ]
+    )
+    response_str = response.choices[0].message.content
+    start, end = response_str.find('['), response_str.find(']')
+    return ast.literal_eval(response_str[start:end+1])
+
+
+def evaluate_retrieval(search_queries: list, k: int, search: str) -> pd.DataFrame:
+    client = OpenAI()
+    output_path = os.path.join(OUTPUT_DIR, f'gpt_evaluations_{search}_search.csv')
+    rows = []
+    for query in tqdm(search_queries):
+        attempt = 0
+        success = False
+        while not success and attempt < MAX_ATTEMPTS:
+            try:
+                metadata = {}
+                if search != 'vector':
+                    metadata = ast.literal_eval(extract_metadata(query)['generated_response'])
+                query_rows = []
+                for chunking_strategy in CHUNKING_STRATEGIES:
+                    for embedding_model in EMBEDDING_MODELS:
+                        start = time.perf_counter()
+                        search_results = search_movies(
+                            chunking_strategy=chunking_strategy,
+                            embedding_model=embedding_model,
+                            query=query,
+                            metadata=metadata,
+                            k=k,
+                            min_similarity_score=0,
+                            search_mode=SEARCH_MODES[search]
+                        )['search_results']
+                        latency_ms = (time.perf_counter() - start) * 1000
+                        query_rows.append({
+                            'chunking_strategy': chunking_strategy,
+                            'embedding_model': embedding_model,
+                            'search_query': query,
+                            'extracted_metadata': metadata,
+                            'scores': gpt_evaluate(client, query, search_results, k),
+                            'latency_ms': round(latency_ms, 2)
+                        })
+                rows.extend(query_rows)
+                success = True
+                pd.DataFrame(rows).to_csv(output_path, index=False)
+            except Exception as e:
+                print(e)
+                attempt += 1
+    return pd.DataFrame(rows)
+
+
+def compute_precision_at_k(scores: list) -> float:
+    return round(np.mean([sum(score) / len(score) for score in scores]), 4)
+
+
+def compute_hit_rate(scores: list) -> float:
+    return round(np.mean([1 if 1 in score else 0 for score in scores]), 4)
+
+
+def compute_ndcg(scores: list) -> float:
+    ndcg = []
+    for score in scores:
+        dcg = sum([s/np.log(i+2) for i, s in enumerate(score)])
+        idcg = sum([1/np.log(i+2) for i, s in enumerate(score)])
+        ndcg.append(dcg/idcg)
+    return round(np.mean(ndcg), 4)
+
+
+def compute_mrr(scores: list) -> float:
+    mrr = []
+    for score in scores:
+        ranks = [1/(i+1) for i, s in enumerate(score) if s == 1]
+        mrr.append(ranks[0] if len(ranks) > 0 else 0)
+    return round(np.mean(mrr), 4)
+
+
+def compute_all_metrics(evaluation_results: pd.DataFrame) -> pd.DataFrame:
+    rows = []
+    for chunking_strategy in CHUNKING_STRATEGIES:
+        for embedding_model in EMBEDDING_MODELS:
+            valid_df = evaluation_results[
+                (evaluation_results['chunking_strategy'] == chunking_strategy) &
+                (evaluation_results['embedding_model'] == embedding_model)
+            ]
+            scores = [score for score in valid_df['scores'] if len(score) > 0]
+            # evaluations recorded before latency was measured have no latency_ms
+            latency = valid_df.get('latency_ms', pd.Series([np.nan])).dropna()
+            if len(latency) == 0:
+                latency = pd.Series([np.nan])
+            rows.append({
+                'Chunking Strategy + Embedding model': f"{chunking_strategy} + {embedding_model}",
+                'Precision@K': compute_precision_at_k(scores),
+                'HitRate': compute_hit_rate(scores),
+                'NDCG': compute_ndcg(scores),
+                'MRR': compute_mrr(scores),
+                'Latency p50 (ms)': round(np.percentile(latency, 50), 2),
+                'Latency p95 (ms)': round(np.percentile(latency, 95), 2)
+            })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--search', choices=list(SEARCH_MODES), default='rrf')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--queries', default='TestQueries.txt')
+    parser.add_argument('--metrics-only', action='store_true',
+                        help='recompute metrics from an existing evaluations CSV')
+    args = parser.parse_args()
+
+    if args.metrics_only:
+        evaluation_results = pd.read_csv(
+            os.path.join(OUTPUT_DIR, f'gpt_evaluations_{args.search}_search.csv')
+        )
+        evaluation_results['scores'] = evaluation_results['scores'].apply(
+            lambda score: list(map(int, ast.literal_eval(score)))
+        )
+    else:
+        with open(args.queries, 'r', encoding='utf-8') as f:
+            search_queries = [q.strip() for q in f.readlines() if q.strip()]
+        evaluation_results = evaluate_retrieval(search_queries, args.k, args.search)
+
+    metrics = compute_all_metrics(evaluation_results)
+    metrics.to_csv(os.path.join(OUTPUT_DIR, f'metrics_{args.search}_search.csv'), index=False)
+    print(metrics.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
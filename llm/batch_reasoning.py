@@ -0,0 +1,68 @@
+"""
+Prompts for explaining a whole result page. In 'structured' mode one
+prompt lists every movie and asks for a JSON object of reasoning per movie
+number, so the SYSTEM instructions are prefilled once. In 'fanout' mode
+every movie gets its own prompt in the shared-prefix layout, sent
+concurrently so an upstream prefix cache can reuse the common part.
+"""
+import json
+import os
+import re
+
+from dotenv import load_dotenv
+
+from prompt_templates import (BATCH_MOVIE_TEMPLATE, BATCH_REASONING_TEMPLATE,
+                              REASONING_PREFIX_TEMPLATE)
+
+load_dotenv()
+
+BATCH_MODES = ['structured', 'fanout']
+REASONING_BATCH_MODE = os.getenv('REASONING_BATCH_MODE', 'structured')
+# generation budget of a structured prompt per movie it explains
+BATCH_TOKENS_PER_MOVIE = int(os.getenv('BATCH_TOKENS_PER_MOVIE', '128'))
+
+
+def prefix_prompt(title: str, description: str, query: str) -> str:
+    return REASONING_PREFIX_TEMPLATE.replace('<query>', query)\
+                                    .replace('<title>', title)\
+                                    .replace('<description>', description)
+
+
+def batch_prompt(query: str, movies: list) -> str:
+    """
+    One prompt for (title, description) pairs, numbered from 1.
+    """
+    listed = '\n'.join(
+        BATCH_MOVIE_TEMPLATE.replace('<number>', str(number))
+                            .replace('<title>', title)
+                            .replace('<description>', description)
+        for number, (title, description) in enumerate(movies, start=1)
+    )
+    return BATCH_REASONING_TEMPLATE.replace('<movies>', listed).replace('<query>', query)
+
+
+def parse_batch_response(text: str, n_movies: int) -> dict:
+    """
+    Movie number -> reasoning from the answer to batch_prompt. The JSON
+    object is read first, numbered lines ("1. ...", "Movie 2: ...") are
+    the fallback. Numbers outside 1..n_movies are dropped.
+    """
+    parsed = {}
+    start, end = text.find('{'), text.rfind('}')
+    if start != -1 and end > start:
+        try:
+            parsed = {int(number): str(reasoning).strip()
+                      for number, reasoning in json.loads(text[start:end+1]).items()}
+        except Exception as e:
+            print(e)
+    if not parsed:
+        current = None
+        for line in text.splitlines():
+            match = re.match(r"\s*(?:movie\s*)?(\d+)\s*[.:)\-]\s*(.*)", line, re.IGNORECASE)
+            if match:
+                current = int(match.group(1))
+                parsed[current] = match.group(2).strip()
+            elif current is not None and line.strip():
+                parsed[current] += ' ' + line.strip()
+    return {number: reasoning for number, reasoning in parsed.items()
+            if 1 <= number <= n_movies and reasoning}
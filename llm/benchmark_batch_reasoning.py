@@ -0,0 +1,72 @@
+"""
+Tokens and wall-clock time to explain one result page of k movies: k
+per-movie /generate_reasoning/ calls as the UI makes them against one
+/generate_reasoning/batch call per mode. Token counts are taken from the
+gateway /metrics/, so run it against an otherwise idle gateway. Every
+scenario uses a unique query so the reasoning cache is bypassed.
+
+python benchmark_batch_reasoning.py --api http://localhost:8085 --dataset ../streamlit/data.csv --k 5
+"""
+import argparse
+import time
+
+import pandas as pd
+import requests
+
+from batch_reasoning import BATCH_MODES
+
+
+def llm_tokens(session: requests.Session, api: str) -> int:
+    stats = session.get(f"{api}/metrics/").json()['llm']
+    return stats['prompt_tokens'] + stats['completion_tokens']
+
+
+def per_movie(session: requests.Session, api: str, query: str, movies: list) -> None:
+    for title, description in movies:
+        session.post(f"{api}/generate_reasoning/", json={
+            "title": title, "description": description, "query": query
+        }).raise_for_status()
+
+
+def batched(session: requests.Session, api: str, query: str, movies: list, mode: str) -> None:
+    session.post(f"{api}/generate_reasoning/batch", json={
+        "query": query,
+        "mode": mode,
+        "movies": [{"title": title, "description": description} for title, description in movies]
+    }).raise_for_status()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--api', default='http://localhost:8085')
+    parser.add_argument('--dataset', default='../streamlit/data.csv')
+    parser.add_argument('--query', default='movies about friendship and adventure')
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--pages', type=int, default=5)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.dataset)
+    session = requests.Session()
+    scenarios = {'per-movie': per_movie}
+    scenarios.update({
+        f"batch/{mode}": lambda s, a, q, m, mode=mode: batched(s, a, q, m, mode)
+        for mode in BATCH_MODES
+    })
+    for name, run in scenarios.items():
+        tokens, seconds = 0, 0.0
+        for page in range(args.pages):
+            movies = list(df[['title', 'description']].sample(args.k, random_state=page).itertuples(index=False))
+            query = f"{args.query} #{time.time_ns()}"
+            before = llm_tokens(session, args.api)
+            start = time.perf_counter()
+            run(session, args.api, query, movies)
+            seconds += time.perf_counter() - start
+            tokens += llm_tokens(session, args.api) - before
+        print(
+            f"{name}: {tokens / args.pages:.0f} tokens/page "
+            f"{seconds / args.pages:.2f} s/page {seconds / args.pages / args.k * 1000:.0f} ms/result"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Load test for /generate_reasoning/ with an increasing number of concurrent
+clients. Run the gateway against stub_llm.py to measure the gateway itself:
+with LLM_CONCURRENCY upstream slots throughput should grow with the number
+of clients up to that limit, requests past LLM_QUEUE_SIZE are rejected (429).
+
+LLM_API=http://localhost:8000 uvicorn llm_api:app --port 8085
+python benchmark_gateway.py --api http://localhost:8085 --clients 1 4 16 64 --requests 200
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+
+def run(api: str, clients: int, n_requests: int) -> dict:
+    session = requests.Session()
+    body = {
+        "title": "The Matrix",
+        "description": "A hacker learns that reality is a simulation.",
+        "query": "movies about simulated worlds"
+    }
+
+    def call(_) -> tuple:
+        start = time.perf_counter()
+        response = session.post(f"{api}/generate_reasoning/", json=body)
+        return response.status_code, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(call, range(n_requests)))
+    elapsed = time.perf_counter() - start
+    latencies = [latency for status, latency in results if status == 200]
+    return {
+        'clients': clients,
+        'ok': len(latencies),
+        'rejected': sum(status == 429 for status, _ in results),
+        'throughput': len(latencies) / elapsed,
+        'p50_ms': np.percentile(latencies, 50) * 1000 if latencies else float('nan'),
+        'p99_ms': np.percentile(latencies, 99) * 1000 if latencies else float('nan')
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--api', default='http://localhost:8085')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        result = run(args.api, clients, args.requests)
+        print(
+            f"clients={result['clients']} ok={result['ok']} rejected={result['rejected']} "
+            f"throughput={result['throughput']:.1f} req/s "
+            f"p50={result['p50_ms']:.0f}ms p99={result['p99_ms']:.0f}ms"
+        )
+    print(requests.get(f"{args.api}/metrics/").json().get('llm'))
+
+
+if __name__ == '__main__':
+    main()
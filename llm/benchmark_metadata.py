@@ -0,0 +1,52 @@
+"""
+Replays queries against /extract_metadata/ --repeat times and reports how
+many were answered from the cache, by the rule-based extractor or by the
+LLM, with the latency of each path (see /metrics/).
+
+python benchmark_metadata.py --api http://localhost:8085 --queries ../evaluation/TestQueries.txt --repeat 2
+"""
+import argparse
+import collections
+import time
+
+import numpy as np
+import requests
+
+STRUCTURED_QUERIES = [
+    'horror movie from 2010',
+    'comedies from the 90s',
+    'sci-fi films between 1980 and 1990',
+    'documentaries after 2015',
+    'romance movies'
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--api', default='http://localhost:8085')
+    parser.add_argument('--queries', default='../evaluation/TestQueries.txt')
+    parser.add_argument('--repeat', type=int, default=2)
+    args = parser.parse_args()
+
+    with open(args.queries, 'r', encoding='utf-8-sig') as f:
+        queries = [line.strip() for line in f if line.strip()] + STRUCTURED_QUERIES
+
+    session = requests.Session()
+    latencies = collections.defaultdict(list)
+    for _ in range(args.repeat):
+        for query in queries:
+            start = time.perf_counter()
+            response = session.post(f"{args.api}/extract_metadata/", json={"query": query})
+            if response.status_code == 200:
+                latencies[response.json().get('source', 'llm')].append(time.perf_counter() - start)
+
+    for source, values in latencies.items():
+        print(
+            f"{source}: {len(values)} requests "
+            f"p50={np.percentile(values, 50) * 1000:.1f}ms p95={np.percentile(values, 95) * 1000:.1f}ms"
+        )
+    print(session.get(f"{args.api}/metrics/").json().get('metadata'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Time to the first visible token of /generate_reasoning/stream against the
+full latency of /generate_reasoning/. Every request uses a unique query so
+the reasoning cache is bypassed. Run the gateway against stub_llm.py with
+STUB_TOKEN_DELAY set to the per-token delay to simulate.
+
+STUB_TOKEN_DELAY=0.05 uvicorn stub_llm:app --port 8000
+LLM_API=http://localhost:8000 LLM_UPSTREAM_STREAMING=true uvicorn llm_api:app --port 8085
+python benchmark_streaming.py --api http://localhost:8085 --requests 20
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import requests
+
+
+def reasoning_body(i: int) -> dict:
+    return {
+        "title": "The Matrix",
+        "description": "A hacker learns that reality is a simulation.",
+        "query": f"movies about simulated worlds #{time.time_ns()}-{i}"
+    }
+
+
+def blocking_latency(session: requests.Session, api: str, i: int) -> float:
+    start = time.perf_counter()
+    session.post(f"{api}/generate_reasoning/", json=reasoning_body(i)).raise_for_status()
+    return time.perf_counter() - start
+
+
+def streaming_latency(session: requests.Session, api: str, i: int) -> tuple:
+    """
+    (seconds to the first token, seconds to the end of the stream)
+    """
+    start = time.perf_counter()
+    first = None
+    with session.post(f"{api}/generate_reasoning/stream", json=reasoning_body(i), stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            if first is None and json.loads(data).get('token'):
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--api', default='http://localhost:8085')
+    parser.add_argument('--requests', type=int, default=20)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    blocking = [blocking_latency(session, args.api, i) for i in range(args.requests)]
+    streaming = [streaming_latency(session, args.api, i) for i in range(args.requests)]
+    first_token = [first for first, _ in streaming if first is not None]
+    total = [end for _, end in streaming]
+
+    print(f"blocking: first visible text p50={np.percentile(blocking, 50) * 1000:.0f}ms")
+    print(
+        f"streaming: first visible text p50={np.percentile(first_token, 50) * 1000:.0f}ms "
+        f"complete p50={np.percentile(total, 50) * 1000:.0f}ms"
+    )
+    print(f"time-to-first-token speedup: {np.median(blocking) / np.median(first_token):.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,66 @@
+import ast
+import asyncio
+import json
 import os
-from typing import Any
+import time
+from contextlib import asynccontextmanager
 
+import httpx
 import uvicorn
-import requests
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
-from schema import MetadataInput, ReasoningInput
+from fastapi.responses import StreamingResponse
+from schema import BatchReasoningInput, MetadataInput, PrefetchInput, ReasoningInput
 from prompt_templates import METADATA_TEMPLATE, REASONING_TEMPLATE
+from llm_client import LLM_UPSTREAM_STREAMING, LLMClient, QueueFullError, token_usage
+from metadata_cache import MetadataCache
+from metadata_rules import rule_based_metadata
+from reasoning_cache import ReasoningCache, reasoning_key
+from batch_reasoning import (BATCH_MODES, BATCH_TOKENS_PER_MOVIE, REASONING_BATCH_MODE,
+                             batch_prompt, parse_batch_response, prefix_prompt)
 
 load_dotenv()
 
-app = FastAPI()
+# seconds a client rejected with 429 is asked to wait
+RETRY_AFTER = os.getenv('LLM_RETRY_AFTER', '1')
+# movies a single prefetch request may start generating for
+REASONING_PREFETCH_LIMIT = int(os.getenv('REASONING_PREFETCH_LIMIT', '5'))
+GENERATION_PARAMS = {
+    "max_tokens": 256,
+    "temperature": 0.8,
+    "top_p": 0.95,
+    "repeat_penalty": 1.2,
+    "top_k": 50,
+    "stop": ['USER:'],
+    "echo": False
+}
+
+llm_client = LLMClient(os.getenv('LLM_API'))
+metadata_cache = MetadataCache()
+reasoning_cache = ReasoningCache()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await llm_client.start()
+    yield
+    await llm_client.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def generate(prompt: str, parameters: dict = GENERATION_PARAMS) -> dict:
+    try:
+        return await llm_client.generate(prompt, parameters)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": RETRY_AFTER})
+    except httpx.TimeoutException as e:
+        raise HTTPException(status_code=504, detail=f"LLM timeout: {e!r}")
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=502, detail=f"LLM returned {e.response.status_code}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/")
@@ -20,58 +70,208 @@ def status_api_check() -> dict[str, str]:
     }
 
 
+@app.get("/metrics/")
+def metrics() -> dict:
+    return {
+        "llm": llm_client.stats(),
+        "metadata": metadata_cache.stats(),
+        "reasoning": reasoning_cache.stats()
+    }
+
+
 @app.post("/extract_metadata/")
 async def extract_metadata(data: MetadataInput) -> dict[str, str]:
-    params = {
-                    "max_tokens": 256,
-                    "temperature": 0.8,
-                    "top_p": 0.95,
-                    "repeat_penalty": 1.2,
-                    "top_k": 50,
-                    "stop": ['USER:'],
-                    "echo": False
-                    }
-    url = f"{os.getenv('LLM_API')}/generate_response"
+    """
+    Served from the cache or the rule-based extractor when possible, LLM
+    answers that parse to a dictionary are cached.
+    """
+    start = time.perf_counter()
+    metadata = metadata_cache.get(data.query)
+    if metadata is not None:
+        metadata['query'] = data.query
+        metadata_cache.record('cache', time.perf_counter() - start)
+        return {"generated_response": repr(metadata), "source": "cache"}
+    metadata = rule_based_metadata(data.query)
+    if metadata is not None:
+        metadata_cache.put(data.query, metadata)
+        metadata_cache.record('rules', time.perf_counter() - start)
+        return {"generated_response": repr(metadata), "source": "rules"}
+
     prompt = METADATA_TEMPLATE.replace('<query>', data.query)
-    body = {
-        "prompt": prompt,
-        "parameters": params
-    }
+    response = await generate(prompt)
+    response['generated_response'] = response['generated_response'].replace('{{', '{').replace('}}', '}')
+    start_index = response['generated_response'].find('{')
+    end_index = response['generated_response'].find('}')
+    response['generated_response'] = response['generated_response'][start_index:end_index+1]
     try:
-        response = requests.post(url, json=body)
-        if response.status_code == 200:
-            response = response.json()
-            response['generated_response'] = response['generated_response'].replace('{{', '{').replace('}}', '}')
-            start = response['generated_response'].find('{')
-            end = response['generated_response'].find('}')
-            response['generated_response'] = response['generated_response'][start:end+1]
-            return response
+        metadata = ast.literal_eval(response['generated_response'])
+        if isinstance(metadata, dict):
+            metadata_cache.put(data.query, metadata)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        print(e)
+    metadata_cache.record('llm', time.perf_counter() - start)
+    response['source'] = "llm"
+    return response
+
+
+def reasoning_prompt(title: str, description: str, query: str) -> str:
+    return REASONING_TEMPLATE.replace('<title>', title)\
+                             .replace('<description>', description)\
+                             .replace('<query>', query)
 
 
 @app.post("/generate_reasoning/")
 async def generate_reasoning(data: ReasoningInput) -> dict[str, str]:
-    params = {
-                    "max_tokens": 256,
-                    "temperature": 0.8,
-                    "top_p": 0.95,
-                    "repeat_penalty": 1.2,
-                    "top_k": 50,
-                    "stop": ['USER:'],
-                    "echo": False
-                    }
-    url = f"{os.getenv('LLM_API')}/generate_response"
-    prompt = REASONING_TEMPLATE.replace('<title>', data.title)\
-                               .replace('<description>', data.description)\
-                               .replace('<query>', data.query)
-    body = {
-        "prompt": prompt,
-        "parameters": params
+    key = reasoning_key(data.title, data.description, data.query, data.language)
+    return await reasoning_cache.get(
+        key, lambda: generate(reasoning_prompt(data.title, data.description, data.query))
+    )
+
+
+def sse_event(data) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+
+@app.post("/generate_reasoning/stream")
+async def stream_reasoning(data: ReasoningInput) -> StreamingResponse:
+    """
+    Server-Sent Events with {"token": ...} pieces of the reasoning, then
+    [DONE]. Tokens are relayed as generated when the upstream server streams
+    (LLM_UPSTREAM_STREAMING); otherwise, or when the streamed call fails
+    before any token, the reasoning is generated in one call and sent as a
+    single event. Cached reasoning is sent at once, and a generation in
+    flight for the same movie is joined rather than started again.
+    """
+    key = reasoning_key(data.title, data.description, data.query, data.language)
+    prompt = reasoning_prompt(data.title, data.description, data.query)
+    entry = reasoning_cache.peek(key)
+    if entry is None and llm_client.is_full():
+        raise HTTPException(status_code=429, detail="LLM queue is full", headers={"Retry-After": RETRY_AFTER})
+    if entry is None and not LLM_UPSTREAM_STREAMING:
+        entry = reasoning_cache.start(key, lambda: generate(prompt))
+
+    async def single_event():
+        try:
+            response = await asyncio.shield(entry) if isinstance(entry, asyncio.Future) else entry
+        except Exception as e:
+            yield sse_event({"error": repr(e)})
+            return
+        yield sse_event({"token": response['generated_response']})
+        yield "data: [DONE]\n\n"
+
+    async def relayed_events():
+        # registered so concurrent and prefetch requests join this stream
+        future = reasoning_cache.register(key)
+        pieces = []
+        try:
+            try:
+                async for piece in llm_client.stream(prompt, GENERATION_PARAMS):
+                    pieces.append(piece)
+                    yield sse_event({"token": piece})
+                response = {"generated_response": ''.join(pieces)}
+            except Exception as e:
+                if pieces:
+                    raise
+                print(e)
+                response = await generate(prompt)
+                yield sse_event({"token": response['generated_response']})
+            future.set_result(response)
+            yield "data: [DONE]\n\n"
+        except Exception as e:
+            future.set_exception(e)
+            yield sse_event({"error": repr(e)})
+        finally:
+            if not future.done():
+                future.set_exception(RuntimeError("stream closed before the reasoning was complete"))
+
+    return StreamingResponse(
+        single_event() if entry is not None else relayed_events(), media_type="text/event-stream"
+    )
+
+
+@app.post("/generate_reasoning/batch")
+async def generate_reasoning_batch(data: BatchReasoningInput) -> dict:
+    """
+    Reasoning for every movie of a result page, as a list of
+    {"title", "reasoning"} in the order of the input so movies sharing a
+    title keep their own answer.
+    Cached movies are reused; the rest are explained with one structured
+    prompt or fanned out concurrently with shared-prefix prompts. Movies a
+    structured answer leaves out are fanned out as well.
+    """
+    mode = data.mode or REASONING_BATCH_MODE
+    if mode not in BATCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown mode {mode}, expected one of {BATCH_MODES}")
+    start = time.perf_counter()
+    usage = {"prompt_tokens": 0, "completion_tokens": 0}
+
+    async def counted(prompt: str, parameters: dict = GENERATION_PARAMS) -> dict:
+        response = await generate(prompt, parameters)
+        prompt_tokens, completion_tokens = token_usage(
+            prompt, response['generated_response'], response.get('usage')
+        )
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+        return response
+
+    keys = [
+        reasoning_key(movie.title, movie.description, data.query, data.language)
+        for movie in data.movies
+    ]
+    entries = [reasoning_cache.peek(key) for key in keys]
+    results = {
+        i: entry['generated_response'] for i, entry in enumerate(entries)
+        if isinstance(entry, dict)
+    }
+    missing = [i for i, entry in enumerate(entries) if entry is None]
+
+    if mode == 'structured' and len(missing) > 1:
+        response = await counted(
+            batch_prompt(data.query, [(data.movies[i].title, data.movies[i].description) for i in missing]),
+            {**GENERATION_PARAMS, "max_tokens": BATCH_TOKENS_PER_MOVIE * len(missing)}
+        )
+        parsed = parse_batch_response(response['generated_response'], len(missing))
+        for number, i in enumerate(missing, start=1):
+            if number in parsed:
+                results[i] = parsed[number]
+                reasoning_cache.put(keys[i], {"generated_response": parsed[number]})
+        missing = [i for i in missing if i not in results]
+
+    pending = [i for i, entry in enumerate(entries) if isinstance(entry, asyncio.Future)] + missing
+    responses = await asyncio.gather(*[
+        reasoning_cache.get(keys[i], lambda movie=data.movies[i]: counted(
+            prefix_prompt(movie.title, movie.description, data.query)
+        )) for i in pending
+    ])
+    for i, response in zip(pending, responses):
+        results[i] = response['generated_response']
+
+    return {
+        "reasoning": [
+            {"title": movie.title, "reasoning": results[i]} for i, movie in enumerate(data.movies)
+        ],
+        "mode": mode,
+        **usage,
+        "seconds": time.perf_counter() - start
+    }
+
+
+@app.post("/prefetch_reasoning/")
+async def prefetch_reasoning(data: PrefetchInput) -> dict[str, int]:
+    """
+    Starts generating reasoning for the given movies in the background and
+    returns at once, later /generate_reasoning/ calls for them are served
+    from the cache or wait for the running generation. Prefetches take one
+    of the LLM_BACKGROUND_CONCURRENCY background slots first, a request
+    for a movie whose prefetch is still waiting for one generates at once.
+    """
+    scheduled = 0
+    for movie in data.movies[:REASONING_PREFETCH_LIMIT]:
+        key = reasoning_key(movie.title, movie.description, data.query, data.language)
+        prompt = reasoning_prompt(movie.title, movie.description, data.query)
+        scheduled += reasoning_cache.prefetch(
+            key, lambda prompt=prompt: generate(prompt), llm_client.background_semaphore
+        )
+    return {
+        "scheduled": scheduled
     }
-    try:
-        response = requests.post(url, json=body)
-        if response.status_code == 200:
-            return response.json()
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,191 @@
+"""
+Shared async client for the upstream LLM server. One keep-alive connection
+pool serves all requests, at most LLM_CONCURRENCY generations run upstream
+at a time and up to LLM_QUEUE_SIZE more wait for a slot; past that
+requests are rejected so callers can back off instead of piling up.
+"""
+import asyncio
+import json
+import os
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', '120'))
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '4'))
+LLM_QUEUE_SIZE = int(os.getenv('LLM_QUEUE_SIZE', '32'))
+# upstream slots background (prefetch) generations may hold at once
+LLM_BACKGROUND_CONCURRENCY = int(os.getenv('LLM_BACKGROUND_CONCURRENCY', '1'))
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', str(LLM_CONCURRENCY * 2)))
+# the upstream server streams when "stream": true is in the parameters,
+# off until the deployed server is known to support it
+LLM_UPSTREAM_STREAMING = os.getenv('LLM_UPSTREAM_STREAMING', 'false').lower() == 'true'
+# token estimate when the upstream response carries no usage
+CHARS_PER_TOKEN = 4
+
+
+class QueueFullError(Exception):
+    pass
+
+
+def token_usage(prompt: str, completion: str, usage: dict = None) -> tuple:
+    """
+    (prompt_tokens, completion_tokens) reported by the upstream server,
+    estimated from the text length when the response has no usage.
+    """
+    usage = usage or {}
+    return (
+        usage.get('prompt_tokens', len(prompt) // CHARS_PER_TOKEN),
+        usage.get('completion_tokens', len(completion) // CHARS_PER_TOKEN)
+    )
+
+
+def event_text(event: dict) -> str:
+    """
+    Text of a streamed event, {"token": ...} or a llama-cpp completion chunk.
+    """
+    if 'token' in event:
+        return event['token']
+    return event['choices'][0]['text']
+
+
+class LLMClient:
+    def __init__(
+            self,
+            base_url: str,
+            concurrency: int = LLM_CONCURRENCY,
+            queue_size: int = LLM_QUEUE_SIZE) -> None:
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.client = None
+        self.semaphore = None
+        self.background_semaphore = None
+        self.pending = 0
+        self.counters = {
+            'requests': 0, 'rejected': 0, 'errors': 0,
+            'prompt_tokens': 0, 'completion_tokens': 0
+        }
+        self.upstream_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    async def start(self):
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        # held by background (prefetch) generations before they queue for a slot,
+        # so they never hold more than LLM_BACKGROUND_CONCURRENCY upstream slots
+        self.background_semaphore = asyncio.Semaphore(max(1, min(LLM_BACKGROUND_CONCURRENCY, self.concurrency)))
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_CONNECTIONS
+            )
+        )
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def generate(self, prompt: str, parameters: dict) -> dict:
+        """
+        Posts the prompt to /generate_response once a slot is free and
+        returns the JSON response. Raises QueueFullError when the queue of
+        waiting requests is full.
+        """
+        if self.pending >= self.concurrency + self.queue_size:
+            self.counters['rejected'] += 1
+            raise QueueFullError(f"{self.pending} LLM requests in flight")
+        self.pending += 1
+        self.counters['requests'] += 1
+        queued = time.perf_counter()
+        try:
+            async with self.semaphore:
+                start = time.perf_counter()
+                self.wait_seconds += start - queued
+                try:
+                    response = await self.client.post(
+                        '/generate_response', json={'prompt': prompt, 'parameters': parameters}
+                    )
+                    response.raise_for_status()
+                    result = response.json()
+                    self.count_tokens(prompt, result.get('generated_response', ''), result.get('usage'))
+                    return result
+                except Exception:
+                    self.counters['errors'] += 1
+                    raise
+                finally:
+                    self.upstream_seconds += time.perf_counter() - start
+        finally:
+            self.pending -= 1
+
+    def is_full(self) -> bool:
+        return self.pending >= self.concurrency + self.queue_size
+
+    async def stream(self, prompt: str, parameters: dict):
+        """
+        Yields generated text pieces as the upstream server emits them, only
+        for upstream servers that support "stream": true in the parameters
+        (LLM_UPSTREAM_STREAMING). Server-Sent Events are relayed event by
+        event, a plain JSON answer is yielded whole. Takes a slot like
+        generate and raises QueueFullError the same way.
+        """
+        if self.is_full():
+            self.counters['rejected'] += 1
+            raise QueueFullError(f"{self.pending} LLM requests in flight")
+        self.pending += 1
+        self.counters['requests'] += 1
+        queued = time.perf_counter()
+        try:
+            async with self.semaphore:
+                start = time.perf_counter()
+                self.wait_seconds += start - queued
+                try:
+                    async with self.client.stream(
+                            'POST', '/generate_response',
+                            json={'prompt': prompt, 'parameters': {**parameters, 'stream': True}}
+                    ) as response:
+                        response.raise_for_status()
+                        if not response.headers.get('content-type', '').startswith('text/event-stream'):
+                            result = json.loads(await response.aread())
+                            self.count_tokens(prompt, result['generated_response'], result.get('usage'))
+                            yield result['generated_response']
+                            return
+                        pieces = []
+                        async for line in response.aiter_lines():
+                            if not line.startswith('data:'):
+                                continue
+                            data = line[len('data:'):].strip()
+                            if data == '[DONE]':
+                                break
+                            pieces.append(event_text(json.loads(data)))
+                            yield pieces[-1]
+                        self.count_tokens(prompt, ''.join(pieces))
+                except Exception:
+                    self.counters['errors'] += 1
+                    raise
+                finally:
+                    self.upstream_seconds += time.perf_counter() - start
+        finally:
+            self.pending -= 1
+
+    def count_tokens(self, prompt: str, completion: str, usage: dict = None):
+        prompt_tokens, completion_tokens = token_usage(prompt, completion, usage)
+        self.counters['prompt_tokens'] += prompt_tokens
+        self.counters['completion_tokens'] += completion_tokens
+
+    def stats(self) -> dict:
+        served = max(self.counters['requests'], 1)
+        return {
+            **self.counters,
+            'pending': self.pending,
+            'concurrency': self.concurrency,
+            'queue_size': self.queue_size,
+            'avg_wait_ms': self.wait_seconds / served * 1000,
+            'avg_upstream_ms': self.upstream_seconds / served * 1000
+        }
@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+METADATA_CACHE_SIZE = int(os.getenv('METADATA_CACHE_SIZE', '10000'))
+METADATA_CACHE_TTL = float(os.getenv('METADATA_CACHE_TTL', '86400'))
+SOURCES = ['cache', 'rules', 'llm']
+
+
+def normalize_query(text: str) -> str:
+    """
+    Metadata does not depend on case, spacing or trailing punctuation.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', text).lower().split()).strip(' .?!')
+
+
+class MetadataCache:
+    """
+    Bounded LRU of extracted metadata keyed by normalized query, entries
+    expire after ttl seconds. Also counts where every extraction was
+    answered from and how long it took.
+    """
+    def __init__(
+            self,
+            max_size: int = METADATA_CACHE_SIZE,
+            ttl: float = METADATA_CACHE_TTL) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {source: 0 for source in SOURCES}
+        self.seconds = {source: 0.0 for source in SOURCES}
+
+    def get(self, query: str) -> dict:
+        key = normalize_query(query)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            metadata, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return dict(metadata)
+
+    def put(self, query: str, metadata: dict):
+        key = normalize_query(query)
+        with self.lock:
+            self.entries[key] = (dict(metadata), time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def record(self, source: str, seconds: float):
+        with self.lock:
+            self.counters[source] += 1
+            self.seconds[source] += seconds
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = sum(self.counters.values())
+            latency = {
+                f'avg_{source}_ms': round(self.seconds[source] / self.counters[source] * 1000, 2)
+                if self.counters[source] else 0.0
+                for source in SOURCES
+            }
+            bypassed = self.counters['cache'] + self.counters['rules']
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                **self.counters,
+                **latency,
+                'hit_rate': round(self.counters['cache'] / lookups, 3) if lookups else 0.0,
+                'llm_bypass_rate': round(bypassed / lookups, 3) if lookups else 0.0,
+                # every bypassed extraction would have cost an average LLM call
+                'saved_ms': round(
+                    bypassed * latency['avg_llm_ms']
+                    - self.seconds['cache'] * 1000 - self.seconds['rules'] * 1000, 1
+                )
+            }
@@ -0,0 +1,86 @@
+"""
+Deterministic metadata extraction for trivially structured queries such as
+"horror movies from the 90s" or "comedy between 2000 and 2010". A query is
+answered only when every word is a year expression, a single genre or a
+filler word; anything else, titles included, is left to the LLM. A lone
+year such as "1917" or "2012" may well be a title, so it is only read as
+a year after from/in/of/after/before/since or next to a genre.
+"""
+import re
+
+from metadata_cache import normalize_query
+from prompt_templates import genres
+
+YEAR = r"(19\d{2}|20\d{2})"
+# longest first so "crime shows" wins over "crime"
+GENRE_PATTERNS = [
+    (genre, re.compile(rf"(?<![\w-]){re.escape(genre.lower())}(?![\w-])"))
+    for genre in sorted(genres, key=len, reverse=True) if genre
+]
+YEAR_PATTERNS = [
+    ('range', re.compile(rf"\b(?:between|from)?\s*{YEAR}\s*(?:-|–|to|and|until|till)\s*{YEAR}\b")),
+    ('decade', re.compile(r"\b(?:the\s+)?(19|20)?(\d)0'?s\b")),
+    ('after', re.compile(rf"\b(?:after|since)\s+{YEAR}\b")),
+    ('before', re.compile(rf"\b(?:before|until)\s+{YEAR}\b")),
+    ('year', re.compile(rf"\b(?:from|in|of)\s+{YEAR}\b")),
+    ('bare_year', re.compile(rf"\b{YEAR}\b"))
+]
+FILLER_WORDS = {
+    'a', 'an', 'the', 'some', 'any', 'me', 'us', 'i', 'we', 'please', 'to', 'for',
+    'find', 'bring', 'give', 'show', 'recommend', 'suggest', 'search', 'get', 'list',
+    'want', 'watch', 'looking', 'need', 'like', 'something', 'good', 'best', 'great',
+    'movie', 'movies', 'film', 'films', 'series', 'tv', 'released', 'made', 'from',
+    'in', 'of', 'year', 'years', 'with', 'can', 'you'
+}
+
+
+def extract_years(text: str) -> tuple:
+    """
+    (text without the year expression, min_year, max_year, kind), None
+    when the query holds more than one year expression.
+    """
+    for kind, pattern in YEAR_PATTERNS:
+        match = pattern.search(text)
+        if match is None:
+            continue
+        rest = text[:match.start()] + ' ' + text[match.end():]
+        if re.search(rf"\b{YEAR}\b|\b\d0'?s\b", rest):
+            return None
+        if kind == 'range':
+            return rest, match.group(1), match.group(2), kind
+        if kind == 'decade':
+            # "the 20s" are the 1920s, only the 00s and 10s are this century
+            century = match.group(1) or ('20' if match.group(2) in '01' else '19')
+            start = f"{century}{match.group(2)}0"
+            return rest, start, str(int(start) + 9), kind
+        if kind == 'before':
+            return rest, '', match.group(1), kind
+        return rest, match.group(1), '', kind
+    return text, '', '', None
+
+
+def rule_based_metadata(query: str) -> dict:
+    """
+    Metadata in the format the LLM is prompted for, None when the query
+    needs the LLM.
+    """
+    years = extract_years(normalize_query(query))
+    if years is None:
+        return None
+    text, min_year, max_year, kind = years
+    found = []
+    for genre, pattern in GENRE_PATTERNS:
+        if pattern.search(text):
+            found.append(genre)
+            text = pattern.sub(' ', text)
+    if len(found) > 1 or (kind == 'bare_year' and not found):
+        return None
+    if any(word not in FILLER_WORDS for word in re.findall(r"[\w'-]+", text)):
+        return None
+    return {
+        'title': '',
+        'genre': found[0] if found else '',
+        'min_year': min_year,
+        'max_year': max_year,
+        'query': query
+    }
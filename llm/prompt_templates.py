@@ -49,3 +49,51 @@ Movie description: <description>
 USER: <query>
 AI:
 """
+
+# shared-prefix layout of REASONING_TEMPLATE: the instructions and the query
+# come first and are identical for every movie of a result page, so an
+# upstream prefix/KV cache can reuse them
+REASONING_PREFIX_TEMPLATE = """
+SYSTEM: You are an AI movie search assistant that helps to explain why certain
+movie might be relevant for the user.
+Your task is to explain relevance of the film given user query and
+reccommended movie description.
+
+Follow the guidlines:
+1. Reasoning should be clear and comprehensive
+2. It should be short and informative
+3. Do not reccommended any other movies, provie reasoning for the described
+movie
+
+USER QUERY: <query>
+
+Movie title: <title>
+Movie description: <description>
+
+AI:
+"""
+
+BATCH_REASONING_TEMPLATE = """
+SYSTEM: You are an AI movie search assistant that helps to explain why certain
+movies might be relevant for the user.
+Your task is to explain relevance of every film given user query and
+reccommended movie descriptions.
+
+Follow the guidlines:
+1. Reasoning should be clear and comprehensive
+2. It should be short and informative, two or three sentences per movie
+3. Do not reccommended any other movies, provie reasoning only for the described
+movies
+4. Return only a JSON object mapping the movie number to its reasoning,
+for example {"1": "...", "2": "..."}
+
+<movies>
+
+USER: <query>
+AI:
+"""
+
+BATCH_MOVIE_TEMPLATE = """Movie <number>
+Movie title: <title>
+Movie description: <description>
+"""
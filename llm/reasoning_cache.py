@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from metadata_cache import normalize_query
+
+load_dotenv()
+
+REASONING_CACHE_SIZE = int(os.getenv('REASONING_CACHE_SIZE', '5000'))
+
+
+def reasoning_key(title: str, description: str, query: str, language: str) -> tuple:
+    return (
+        title,
+        hashlib.sha256(description.encode()).hexdigest(),
+        normalize_query(query),
+        language
+    )
+
+
+class ReasoningCache:
+    """
+    Bounded LRU of generated reasoning keyed by (title, description hash,
+    normalized query, language). Generations in flight are kept as tasks
+    or futures, so a request for a movie that is being prefetched or
+    streamed waits for that generation instead of starting another one.
+    A prefetch still waiting for a background slot is cancelled instead,
+    and the request generates at once. Failed generations are dropped and
+    can be retried.
+    """
+    def __init__(self, max_size: int = REASONING_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.tasks = {}
+        # prefetch tasks not admitted to a background slot yet
+        self.queued = {}
+        self.counters = {
+            'hits': 0, 'joined': 0, 'misses': 0, 'prefetched': 0, 'promoted': 0, 'failed': 0
+        }
+
+    def get_or_start(self, key: tuple, generate, prefetch: bool = False):
+        """
+        The cached response or the task generating it, generate is a
+        coroutine function called on a miss.
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            if not prefetch:
+                self.counters['hits'] += 1
+            return self.entries[key]
+        if not prefetch:
+            self.promote(key)
+        if key in self.tasks:
+            if not prefetch:
+                self.counters['joined'] += 1
+            return self.tasks[key]
+        self.counters['prefetched' if prefetch else 'misses'] += 1
+        return self.start(key, generate)
+
+    def start(self, key: tuple, generate) -> asyncio.Task:
+        task = asyncio.create_task(generate())
+        self.track(key, task)
+        return task
+
+    def register(self, key: tuple) -> asyncio.Future:
+        """
+        In-flight entry for a generation the caller drives itself, such as
+        a relayed stream. The caller resolves it with the response or an
+        exception.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self.track(key, future)
+        return future
+
+    def track(self, key: tuple, task: asyncio.Future):
+        self.tasks[key] = task
+        task.add_done_callback(lambda done: self.finish(key, done))
+
+    def promote(self, key: tuple):
+        """
+        Cancels a prefetch of key still waiting for a background slot, so
+        a foreground request does not queue behind the other prefetches.
+        """
+        task = self.queued.pop(key, None)
+        if task is None:
+            return
+        self.tasks.pop(key, None)
+        task.cancel()
+        self.counters['promoted'] += 1
+
+    def finish(self, key: tuple, task: asyncio.Future):
+        if self.tasks.get(key) is not task:
+            # a promoted prefetch, replaced by the foreground generation
+            return
+        del self.tasks[key]
+        self.queued.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            self.counters['failed'] += 1
+            return
+        self.put(key, task.result())
+
+    def peek(self, key: tuple):
+        """
+        Like get_or_start without starting a generation, None on a miss.
+        """
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return self.entries[key]
+        self.promote(key)
+        if key in self.tasks:
+            self.counters['joined'] += 1
+            return self.tasks[key]
+        self.counters['misses'] += 1
+        return None
+
+    def put(self, key: tuple, response: dict):
+        self.entries[key] = response
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    async def get(self, key: tuple, generate) -> dict:
+        entry = self.get_or_start(key, generate)
+        if isinstance(entry, asyncio.Future):
+            # shielded so a disconnecting client does not cancel a shared generation
+            return dict(await asyncio.shield(entry))
+        return dict(entry)
+
+    def prefetch(self, key: tuple, generate, slot: asyncio.Semaphore = None) -> bool:
+        """
+        Starts generating in the background once slot is free, False when
+        already cached or in flight. Until then a foreground request for
+        key promotes it.
+        """
+        if key in self.entries or key in self.tasks:
+            return False
+        if slot is None:
+            self.get_or_start(key, generate, prefetch=True)
+            return True
+
+        async def admitted():
+            async with slot:
+                self.queued.pop(key, None)
+                return await generate()
+
+        self.queued[key] = self.get_or_start(key, admitted, prefetch=True)
+        return True
+
+    def stats(self) -> dict:
+        requests = self.counters['hits'] + self.counters['joined'] + self.counters['misses']
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'in_flight': len(self.tasks),
+            **self.counters,
+            'hit_rate': round(
+                (self.counters['hits'] + self.counters['joined']) / requests, 3
+            ) if requests else 0.0
+        }
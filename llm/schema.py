@@ -9,3 +9,24 @@ class ReasoningInput(BaseModel):
     title: str
     description: str
     query: str
+    # language of the generated text, part of the reasoning cache key
+    language: str = 'en'
+
+
+class MovieInput(BaseModel):
+    title: str
+    description: str
+
+
+class PrefetchInput(BaseModel):
+    query: str
+    movies: list[MovieInput]
+    language: str = 'en'
+
+
+class BatchReasoningInput(BaseModel):
+    query: str
+    movies: list[MovieInput]
+    language: str = 'en'
+    # 'structured' or 'fanout', empty uses REASONING_BATCH_MODE
+    mode: str = ''
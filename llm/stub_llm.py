@@ -0,0 +1,57 @@
+"""
+Stand-in for the upstream LLM server with the same /generate_response
+contract. Every request takes STUB_TOKEN_DELAY seconds per generated token
+(STUB_TOKENS per reasoning) without blocking other requests, like a server
+generating tokens. With "stream": true in the parameters the tokens are
+sent as Server-Sent Events STUB_TOKEN_DELAY apart.
+
+uvicorn stub_llm:app --port 8000
+"""
+import asyncio
+import json
+import os
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+STUB_TOKENS = int(os.getenv('STUB_TOKENS', '64'))
+STUB_TOKEN_DELAY = float(os.getenv('STUB_TOKEN_DELAY', '0.02'))
+METADATA_RESPONSE = "{'genre': ['comedy'], 'min_year': 1990, 'max_year': 2000}"
+
+app = FastAPI()
+
+
+class GenerationInput(BaseModel):
+    prompt: str
+    parameters: dict = {}
+
+
+def stub_tokens(prompt: str) -> list:
+    if 'min_year' in prompt:
+        return [METADATA_RESPONSE]
+    n_movies = prompt.count('Movie title:')
+    if 'movie number' in prompt and n_movies > 1:
+        # answer of a batched reasoning prompt, STUB_TOKENS per movie
+        reasoning = ' '.join(f"token{i}" for i in range(STUB_TOKENS))
+        answer = json.dumps({str(number): reasoning for number in range(1, n_movies + 1)})
+        return [piece + ' ' for piece in answer.split(' ')]
+    return [f"token{i} " for i in range(STUB_TOKENS)]
+
+
+async def stream_tokens(tokens: list):
+    for token in tokens:
+        await asyncio.sleep(STUB_TOKEN_DELAY)
+        yield f"data: {json.dumps({'token': token})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/generate_response")
+async def generate_response(data: GenerationInput):
+    tokens = stub_tokens(data.prompt)
+    if data.parameters.get('stream'):
+        return StreamingResponse(stream_tokens(tokens), media_type="text/event-stream")
+    await asyncio.sleep(len(tokens) * STUB_TOKEN_DELAY)
+    return {
+        "generated_response": ''.join(tokens)
+    }
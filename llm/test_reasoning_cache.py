@@ -0,0 +1,56 @@
+import asyncio
+
+from reasoning_cache import ReasoningCache
+
+
+def test_foreground_request_is_not_queued_behind_prefetches():
+    async def run():
+        cache = ReasoningCache()
+        slot = asyncio.Semaphore(1)
+        release = asyncio.Event()
+        calls = []
+
+        async def slow(title: str) -> dict:
+            calls.append(title)
+            await release.wait()
+            return {"generated_response": f"prefetched {title}"}
+
+        async def fast() -> dict:
+            return {"generated_response": "foreground"}
+
+        for title in ['a', 'b', 'c']:
+            assert cache.prefetch((title,), lambda title=title: slow(title), slot)
+        await asyncio.sleep(0)
+        # 'a' holds the only background slot, 'c' waits behind 'a' and 'b'
+        response = await asyncio.wait_for(cache.get(('c',), fast), timeout=1)
+
+        assert response == {"generated_response": "foreground"}
+        assert cache.stats()['promoted'] == 1
+        release.set()
+        await asyncio.sleep(0.01)
+        assert calls == ['a', 'b']
+        assert cache.peek(('c',)) == {"generated_response": "foreground"}
+        assert cache.stats()['failed'] == 0
+
+    asyncio.run(run())
+
+
+def test_admitted_prefetch_is_joined():
+    async def run():
+        cache = ReasoningCache()
+        slot = asyncio.Semaphore(1)
+
+        async def prefetched() -> dict:
+            await asyncio.sleep(0.01)
+            return {"generated_response": "prefetched"}
+
+        async def foreground() -> dict:
+            return {"generated_response": "foreground"}
+
+        cache.prefetch(('a',), prefetched, slot)
+        await asyncio.sleep(0)
+
+        assert await cache.get(('a',), foreground) == {"generated_response": "prefetched"}
+        assert cache.stats()['joined'] == 1
+
+    asyncio.run(run())
@@ -1,18 +1,22 @@
+import asyncio
 import os
 
+import numpy as np
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from batcher import EmbeddingBatcher
+from hybrid import SEARCH_MODES
 from pgvector import VectorDB
-from populate_db import populate_all
+from projection import project
 
 load_dotenv()
 
 
 app = FastAPI()
 db = VectorDB()
-populate_all()
+batcher = EmbeddingBatcher(db.encode)
 
 
 class SearchMoviesInput(BaseModel):
@@ -22,18 +26,66 @@ class SearchMoviesInput(BaseModel):
     metadata: dict
     k: int
     min_similarity_score: float
+    ef_search: int | None = Field(default=None, gt=0)
+    probes: int | None = Field(default=None, gt=0)
+    filter_strategy: str = 'auto'
+    search_mode: str = 'vector'
+
+
+async def embed_query(query: str, embedding_model: str) -> np.ndarray:
+    """
+    Cached queries are answered directly, misses go through the
+    micro-batcher so concurrent requests share one encode call.
+    """
+    # the cache may read its SQLite file, kept off the event loop
+    embedding = await asyncio.to_thread(db.embedding_cache.get, embedding_model, query)
+    if embedding is None:
+        embedding = await batcher.embed(query, embedding_model)
+    return project(embedding, embedding_model)
 
 
 @app.post("/search_movies/")
 async def search_movies(data: SearchMoviesInput) -> dict:
+    if not await asyncio.to_thread(db.is_table_ready, data.chunking_strategy, data.embedding_model):
+        raise HTTPException(status_code=503, detail="Table is still being populated")
+    if data.search_mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown search mode: {data.search_mode}")
     try:
-        search_results = db.search_movies(
+        query_vector = await embed_query(data.query, data.embedding_model)
+        search_results = await asyncio.to_thread(
+                            db.search_movies_by_vector,
                             chunking_strategy=data.chunking_strategy,
                             embedding_model=data.embedding_model,
-                            query=data.query,
+                            query_vector=query_vector,
                             metadata=data.metadata,
                             k=data.k,
-                            min_similarity_score=data.min_similarity_score
+                            min_similarity_score=data.min_similarity_score,
+                            ef_search=data.ef_search,
+                            probes=data.probes,
+                            filter_strategy=data.filter_strategy,
+                            query=data.query,
+                            search_mode=data.search_mode
+                            )
+        return {"search_results": search_results}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+class SearchMoviesBatchInput(BaseModel):
+    queries: list[SearchMoviesInput]
+
+
+@app.post("/search_movies/batch")
+async def search_movies_batch(data: SearchMoviesBatchInput) -> dict:
+    for search in data.queries:
+        if not await asyncio.to_thread(db.is_table_ready, search.chunking_strategy, search.embedding_model):
+            raise HTTPException(status_code=503, detail="Table is still being populated")
+        if search.search_mode not in SEARCH_MODES:
+            raise HTTPException(status_code=400, detail=f"Unknown search mode: {search.search_mode}")
+    try:
+        search_results = await asyncio.to_thread(
+                            db.search_movies_batch,
+                            [search.model_dump() for search in data.queries]
                             )
         return {"search_results": search_results}
     except Exception as e:
@@ -43,3 +95,8 @@ async def search_movies(data: SearchMoviesInput) -> dict:
 @app.get("/is_alive/")
 async def is_alive() -> dict:
     return {'status': 'alive'}
+
+
+@app.get("/metrics/")
+async def metrics() -> dict:
+    return db.metrics() | {'batcher': batcher.stats()}
@@ -0,0 +1,85 @@
+import asyncio
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBED_MAX_BATCH_SIZE = int(os.getenv('EMBED_MAX_BATCH_SIZE', '32'))
+EMBED_MAX_WAIT_MS = float(os.getenv('EMBED_MAX_WAIT_MS', '5'))
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent embedding requests per model for up to
+    max_wait_ms or max_batch_size items, runs one batched encode on a
+    worker thread and resolves every caller's future with its vector.
+    """
+    def __init__(
+            self,
+            embed_fn,
+            max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+            max_wait_ms: float = EMBED_MAX_WAIT_MS) -> None:
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queues = {}
+        self.workers = {}
+        self.counters = {'requests': 0, 'batches': 0}
+
+    async def embed(self, text: str, embedding_model: str):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue_for(embedding_model).put((text, future))
+        self.counters['requests'] += 1
+        return await future
+
+    def queue_for(self, embedding_model: str) -> asyncio.Queue:
+        if embedding_model not in self.queues:
+            self.queues[embedding_model] = asyncio.Queue()
+            self.workers[embedding_model] = asyncio.create_task(
+                self.run(embedding_model)
+            )
+        return self.queues[embedding_model]
+
+    async def collect(self, queue: asyncio.Queue) -> list:
+        loop = asyncio.get_running_loop()
+        items = [await queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(items) < self.max_batch_size:
+            if not queue.empty():
+                items.append(queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return items
+
+    async def run(self, embedding_model: str):
+        queue = self.queues[embedding_model]
+        while True:
+            items = await self.collect(queue)
+            texts = [text for text, _ in items]
+            self.counters['batches'] += 1
+            try:
+                vectors = await asyncio.to_thread(self.embed_fn, texts, embedding_model)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), vector in zip(items, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self) -> dict:
+        batches = self.counters['batches']
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            **self.counters,
+            'mean_batch_size': round(self.counters['requests'] / batches, 2) if batches else 0.0
+        }
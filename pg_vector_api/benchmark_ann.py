@@ -0,0 +1,89 @@
+"""
+Compares latency and recall@k of the ANN index against the exact scan.
+Stored chunk vectors are used as queries, so no embedding model is needed.
+
+python benchmark_ann.py --k 10 --n-queries 100 --ef-search 40 --probes 10
+"""
+import argparse
+import time
+
+import numpy as np
+
+from db_initialization import init_db
+from indexes import set_search_params
+from populate_db import CHUNKING_STRATEGIES, EMBEDDING_MODELS
+
+
+def sample_queries(conn, table_name: str, n_queries: int) -> list:
+    cur = conn.cursor()
+    cur.execute(f"""
+    SELECT feature_vector::text FROM {table_name}
+    ORDER BY random() LIMIT {n_queries};
+    """)
+    queries = [row[0] for row in cur.fetchall()]
+    cur.close()
+    return queries
+
+
+def top_k(conn, table_name: str, query: str, k: int, exact: bool,
+          ef_search: int, probes: int) -> tuple:
+    cur = conn.cursor()
+    if exact:
+        cur.execute("SET LOCAL enable_indexscan = off;")
+    else:
+        set_search_params(cur, ef_search, probes, k)
+    start = time.perf_counter()
+    cur.execute(f"""
+    SELECT chunk_id FROM {table_name}
+    ORDER BY feature_vector <=> %s::vector
+    LIMIT {k};
+    """, (query,))
+    ids = [row[0] for row in cur.fetchall()]
+    elapsed = time.perf_counter() - start
+    conn.commit()
+    cur.close()
+    return ids, elapsed
+
+
+def benchmark_table(conn, table_name: str, args) -> dict:
+    queries = sample_queries(conn, table_name, args.n_queries)
+    exact_latency, ann_latency, recalls = [], [], []
+    for query in queries:
+        exact_ids, exact_time = top_k(conn, table_name, query, args.k, True,
+                                      args.ef_search, args.probes)
+        ann_ids, ann_time = top_k(conn, table_name, query, args.k, False,
+                                  args.ef_search, args.probes)
+        exact_latency.append(exact_time)
+        ann_latency.append(ann_time)
+        recalls.append(len(set(exact_ids) & set(ann_ids)) / max(len(exact_ids), 1))
+    return {
+        'table': table_name,
+        'exact_p50_ms': np.percentile(exact_latency, 50) * 1000,
+        'exact_p95_ms': np.percentile(exact_latency, 95) * 1000,
+        'ann_p50_ms': np.percentile(ann_latency, 50) * 1000,
+        'ann_p95_ms': np.percentile(ann_latency, 95) * 1000,
+        f'recall@{args.k}': float(np.mean(recalls))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--n-queries', type=int, default=100)
+    parser.add_argument('--ef-search', type=int, default=None)
+    parser.add_argument('--probes', type=int, default=None)
+    args = parser.parse_args()
+
+    conn = init_db()
+    for chunking_strategy in CHUNKING_STRATEGIES:
+        for embedding_model in EMBEDDING_MODELS:
+            table_name = f"{chunking_strategy.lower().replace('-', '_')}_{embedding_model.lower().replace('-', '_')}"
+            result = benchmark_table(conn, table_name, args)
+            print(' '.join(
+                f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in result.items()
+            ))
+
+
+if __name__ == '__main__':
+    main()
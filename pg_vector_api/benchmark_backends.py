@@ -0,0 +1,86 @@
+"""
+Compares the in-process numpy backend with pgvector on /search_movies/
+semantics: latency and agreement of the returned movie titles. Stored
+chunk vectors are used as queries, so no embedding model is needed.
+
+python benchmark_backends.py --k 10 --n-queries 100 --filter-strategy exact
+"""
+import argparse
+import time
+
+import numpy as np
+
+from embedding_store import load_embeddings
+from numpy_backend import NumpyBackend
+from pgvector import VectorDB
+from populate_db import CHUNKING_STRATEGIES, EMBEDDING_MODELS
+
+
+def timed(fn) -> tuple:
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def benchmark_table(
+        db: VectorDB,
+        backend: NumpyBackend,
+        chunking_strategy: str,
+        embedding_model: str,
+        args) -> dict:
+    metadata, vectors = load_embeddings(chunking_strategy, embedding_model)
+    rows = np.random.default_rng(0).choice(len(vectors), args.n_queries, replace=False)
+    filters = {'genre': args.genre} if args.genre else {}
+    min_year, max_year, genre = db.parse_filters(filters)
+    # first call loads the matrix, it is not part of the measurement
+    backend.get_index(chunking_strategy, embedding_model)
+
+    pg_latency, numpy_latency, agreement = [], [], []
+    for row in rows:
+        query_vector = np.asarray(vectors[row], dtype=np.float32)
+        # search_by_vector always runs on Postgres, whatever SEARCH_BACKEND is
+        pg_results, pg_time = timed(lambda: db.pool.run(lambda conn: db.search_by_vector(
+            conn, chunking_strategy, embedding_model, query_vector, filters, args.k, 0,
+            filter_strategy=args.filter_strategy
+        )))
+        numpy_results, numpy_time = timed(lambda: backend.search(
+            chunking_strategy, embedding_model, query_vector,
+            min_year, max_year, genre, args.k, 0
+        ))
+        pg_latency.append(pg_time)
+        numpy_latency.append(numpy_time)
+        pg_titles = {movie['title'] for movie in pg_results}
+        numpy_titles = {movie['title'] for movie in numpy_results}
+        agreement.append(len(pg_titles & numpy_titles) / max(len(pg_titles), 1))
+    return {
+        'table': f"{chunking_strategy}/{embedding_model}",
+        'pgvector_p50_ms': np.percentile(pg_latency, 50) * 1000,
+        'pgvector_p95_ms': np.percentile(pg_latency, 95) * 1000,
+        'numpy_p50_ms': np.percentile(numpy_latency, 50) * 1000,
+        'numpy_p95_ms': np.percentile(numpy_latency, 95) * 1000,
+        f'agreement@{args.k}': float(np.mean(agreement))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--n-queries', type=int, default=100)
+    parser.add_argument('--genre', default='')
+    parser.add_argument('--filter-strategy', default='exact',
+                        choices=['auto', 'ann', 'exact'])
+    args = parser.parse_args()
+
+    db = VectorDB()
+    backend = NumpyBackend()
+    for chunking_strategy in CHUNKING_STRATEGIES:
+        for embedding_model in EMBEDDING_MODELS:
+            result = benchmark_table(db, backend, chunking_strategy, embedding_model, args)
+            print(' '.join(
+                f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                for key, value in result.items()
+            ))
+
+
+if __name__ == '__main__':
+    main()
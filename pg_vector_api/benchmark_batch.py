@@ -0,0 +1,66 @@
+"""
+Throughput of /search_movies/batch against one /search_movies/ call per
+query, using the evaluation queries. Run against a live pgvector-api.
+
+python benchmark_batch.py --api http://localhost:8080 --repeat 5
+"""
+import argparse
+import time
+
+import requests
+
+
+def load_queries(path: str) -> list:
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def make_search(query: str, args) -> dict:
+    return {
+        "chunking_strategy": args.chunking_strategy,
+        "embedding_model": args.embedding_model,
+        "query": query,
+        "metadata": {},
+        "k": args.k,
+        "min_similarity_score": 0
+    }
+
+
+def run_single(searches: list, api: str) -> float:
+    session = requests.Session()
+    start = time.perf_counter()
+    for search in searches:
+        session.post(f"{api}/search_movies/", json=search).raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_batch(searches: list, api: str) -> float:
+    start = time.perf_counter()
+    requests.post(f"{api}/search_movies/batch", json={"queries": searches}).raise_for_status()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--api', default='http://localhost:8080')
+    parser.add_argument('--queries', default='../evaluation/TestQueries.txt')
+    parser.add_argument('--chunking-strategy', default='recursive-splitter')
+    parser.add_argument('--embedding-model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    for i in range(args.repeat):
+        # a different suffix per round keeps the embedding cache cold
+        searches = [make_search(f"{query} #{i}", args) for query in queries]
+        single = run_single(searches[::2], args.api)
+        batch = run_batch(searches[1::2], args.api)
+        print(
+            f"round {i}: single {len(searches[::2]) / single:.1f} queries/sec, "
+            f"batch {len(searches[1::2]) / batch:.1f} queries/sec"
+        )
+
+
+if __name__ == '__main__':
+    main()
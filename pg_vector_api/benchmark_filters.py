@@ -0,0 +1,79 @@
+"""
+Latency and recall@k of the exact, ANN and auto filter strategies on
+genre/year-constrained versions of the evaluation queries. Genres are
+taken from the query text where it names one, year windows are added on
+top. Recall is measured against the exact strategy.
+
+python benchmark_filters.py --chunking-strategy recursive-splitter --k 10
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmark_batch import load_queries
+from pgvector import VectorDB
+
+YEAR_WINDOWS = [None, ('2019', '2019'), ('2000', '2010'), ('1950', '2025')]
+
+
+def load_genres(path: str) -> list:
+    with open(path, 'r') as f:
+        return [g.strip() for g in f if g.strip()]
+
+
+def constrained_searches(queries: list, genres: list) -> list:
+    searches = []
+    for query in queries:
+        words = query.lower().replace(',', ' ').split()
+        genre = next((g for g in genres if g in words), '')
+        for window in YEAR_WINDOWS:
+            metadata = {'genre': genre}
+            if window:
+                metadata['min_year'], metadata['max_year'] = window
+            if genre or window:
+                searches.append((query, metadata))
+    return searches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--queries', default='../evaluation/TestQueries.txt')
+    parser.add_argument('--genres', default='genres.txt')
+    parser.add_argument('--chunking-strategy', default='recursive-splitter')
+    parser.add_argument('--embedding-model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    db = VectorDB()
+    searches = constrained_searches(load_queries(args.queries), load_genres(args.genres))
+    latencies = {strategy: [] for strategy in ['exact', 'ann', 'auto']}
+    recalls = {strategy: [] for strategy in ['ann', 'auto']}
+    for query, metadata in searches:
+        vector = db.get_embeddings([query], args.embedding_model)[0]
+        titles = {}
+        for strategy in latencies:
+            start = time.perf_counter()
+            results = db.search_movies_by_vector(
+                args.chunking_strategy, args.embedding_model, vector,
+                metadata, args.k, 0, filter_strategy=strategy
+            )
+            latencies[strategy].append(time.perf_counter() - start)
+            titles[strategy] = {(r['title'], r['year']) for r in results}
+        for strategy in recalls:
+            if titles['exact']:
+                recalls[strategy].append(
+                    len(titles[strategy] & titles['exact']) / len(titles['exact'])
+                )
+
+    print(f"{len(searches)} constrained searches")
+    for strategy, values in latencies.items():
+        recall = np.mean(recalls[strategy]) if recalls.get(strategy) else 1.0
+        print(
+            f"{strategy}: p50={np.percentile(values, 50) * 1000:.1f}ms "
+            f"p95={np.percentile(values, 95) * 1000:.1f}ms recall@{args.k}={recall:.3f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
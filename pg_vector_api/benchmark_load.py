@@ -0,0 +1,55 @@
+"""
+Load test for /search_movies/ with many concurrent clients. Every request
+gets a unique query so the embedding cache does not hide the encode cost.
+
+python benchmark_load.py --api http://localhost:8080 --clients 50 --requests 1000
+"""
+import argparse
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from benchmark_batch import load_queries, make_search
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--api', default='http://localhost:8080')
+    parser.add_argument('--queries', default='../evaluation/TestQueries.txt')
+    parser.add_argument('--chunking-strategy', default='recursive-splitter')
+    parser.add_argument('--embedding-model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    queries = itertools.cycle(load_queries(args.queries))
+    searches = [
+        make_search(f"{next(queries)} #{time.time_ns()}-{i}", args)
+        for i in range(args.requests)
+    ]
+
+    def call(search: dict) -> float:
+        start = time.perf_counter()
+        requests.post(f"{args.api}/search_movies/", json=search).raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        latencies = list(executor.map(call, searches))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"clients={args.clients} requests={args.requests} "
+        f"throughput={args.requests / elapsed:.1f} req/s "
+        f"p50={np.percentile(latencies, 50) * 1000:.0f}ms "
+        f"p99={np.percentile(latencies, 99) * 1000:.0f}ms"
+    )
+    print(requests.get(f"{args.api}/metrics/").json().get('batcher'))
+
+
+if __name__ == '__main__':
+    main()
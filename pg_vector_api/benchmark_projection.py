@@ -0,0 +1,89 @@
+"""
+Recall@k and latency of exact in-process search over PCA projected
+embeddings against the full model dimension. Stored chunk vectors are used
+as queries and projected like query embeddings are. Missing projections
+are fitted first.
+
+python benchmark_projection.py --dims 128 256 --k 10 --n-queries 100 --output projection.csv
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from embedding_store import load_embeddings
+from numpy_backend import NumpyIndex
+from populate_db import CHUNKING_STRATEGIES, get_table_name
+from projection import (PROJECTION_MODELS, fit_projection, project,
+                        projection_path)
+
+
+def search_all(index: NumpyIndex, queries: np.ndarray, k: int) -> tuple:
+    results, latency = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append([movie for _, movie, _ in index.search(query, 0, 10000, None, k)])
+        latency.append(time.perf_counter() - start)
+    return results, latency
+
+
+def benchmark_table(chunking_strategy: str, embedding_model: str, args) -> list:
+    metadata, vectors = load_embeddings(chunking_strategy, embedding_model)
+    rows = np.sort(np.random.default_rng(0).choice(len(vectors), args.n_queries, replace=False))
+    queries = np.asarray(vectors[rows], dtype=np.float32)
+    exact, latency = search_all(NumpyIndex(metadata, vectors, 'none'), queries, args.k)
+    results = [{
+        'table': get_table_name(chunking_strategy, embedding_model),
+        'dims': vectors.shape[1],
+        'memory_mb': vectors.nbytes / 2**20,
+        'p50_ms': np.percentile(latency, 50) * 1000,
+        'p95_ms': np.percentile(latency, 95) * 1000,
+        f'recall@{args.k}': 1.0
+    }]
+    for dims in args.dims:
+        projected = project(vectors, embedding_model, dims)
+        found, latency = search_all(
+            NumpyIndex(metadata, projected, 'none'),
+            project(queries, embedding_model, dims), args.k
+        )
+        recalls = [len(set(a) & set(b)) / max(len(b), 1) for a, b in zip(found, exact)]
+        results.append({
+            'table': get_table_name(chunking_strategy, embedding_model),
+            'dims': dims,
+            'memory_mb': projected.nbytes / 2**20,
+            'p50_ms': np.percentile(latency, 50) * 1000,
+            'p95_ms': np.percentile(latency, 95) * 1000,
+            f'recall@{args.k}': float(np.mean(recalls))
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dims', type=int, nargs='+', default=[128, 256])
+    parser.add_argument('--models', nargs='+', default=PROJECTION_MODELS)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--n-queries', type=int, default=100)
+    parser.add_argument('--output', default=None, help='CSV file for the results')
+    args = parser.parse_args()
+
+    results = []
+    for embedding_model in args.models:
+        for dims in args.dims:
+            if not os.path.exists(projection_path(embedding_model, dims)):
+                fit_projection(embedding_model, CHUNKING_STRATEGIES, dims)
+        for chunking_strategy in CHUNKING_STRATEGIES:
+            for result in benchmark_table(chunking_strategy, embedding_model, args):
+                print(' '.join(
+                    f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in result.items()
+                ))
+                results.append(result)
+    if args.output:
+        pd.DataFrame(results).to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
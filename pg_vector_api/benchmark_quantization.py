@@ -0,0 +1,155 @@
+"""
+Memory footprint, latency and recall@k of the quantization modes against
+the float32 baseline. Postgres modes (none, halfvec, binary) rebuild the
+vector index of every table and re-rank a shortlist of k * RERANK_FACTOR
+chunks with the float32 distance. The numpy int8 mode is measured on the
+embedding store. Stored chunk vectors are used as queries.
+
+The configured index of every table is restored at the end.
+
+python benchmark_quantization.py --k 10 --n-queries 100 --output quantization.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmark_ann import sample_queries
+from db_initialization import init_db
+from embedding_store import load_embeddings
+from indexes import (INDEX_METHOD, QUANTIZATION_MODES, create_vector_index,
+                     index_name, quantized_distance, set_search_params,
+                     vector_dims)
+from numpy_backend import RERANK_FACTOR, NumpyIndex
+from populate_db import CHUNKING_STRATEGIES, EMBEDDING_MODELS, get_table_name
+
+
+def index_bytes(conn, name: str) -> int:
+    cur = conn.cursor()
+    cur.execute("SELECT pg_relation_size(%s::regclass);", (name,))
+    size = cur.fetchone()[0]
+    cur.close()
+    return size
+
+
+def top_k(conn, table_name: str, query: str, k: int, quantization: str, dims: int) -> tuple:
+    """
+    Chunk ids of the k nearest chunks, exact when quantization is None.
+    """
+    cur = conn.cursor()
+    if quantization is None:
+        cur.execute("SET LOCAL enable_indexscan = off;")
+        sql = f"""
+        SELECT chunk_id FROM {table_name}
+        ORDER BY feature_vector <=> %(query)s::vector
+        LIMIT {k};
+        """
+    else:
+        set_search_params(cur, limit=k*RERANK_FACTOR)
+        order_by = quantized_distance(quantization, dims, 'feature_vector', '%(query)s::vector')
+        sql = f"""
+        SELECT chunk_id FROM (
+            SELECT chunk_id, feature_vector <=> %(query)s::vector AS distance
+            FROM {table_name}
+            ORDER BY {order_by}
+            LIMIT {k*RERANK_FACTOR}
+        ) shortlist
+        ORDER BY distance
+        LIMIT {k};
+        """
+    start = time.perf_counter()
+    cur.execute(sql, {'query': query})
+    ids = [row[0] for row in cur.fetchall()]
+    elapsed = time.perf_counter() - start
+    conn.commit()
+    cur.close()
+    return ids, elapsed
+
+
+def benchmark_postgres(conn, table_name: str, args) -> list:
+    queries = sample_queries(conn, table_name, args.n_queries)
+    dims = vector_dims(conn, table_name)
+    exact = [top_k(conn, table_name, query, args.k, None, dims)[0] for query in queries]
+    results = []
+    for quantization in QUANTIZATION_MODES:
+        create_vector_index(conn, table_name, INDEX_METHOD, quantization)
+        latency, recalls = [], []
+        for query, exact_ids in zip(queries, exact):
+            ids, elapsed = top_k(conn, table_name, query, args.k, quantization, dims)
+            latency.append(elapsed)
+            recalls.append(len(set(ids) & set(exact_ids)) / max(len(exact_ids), 1))
+        results.append({
+            'table': table_name,
+            'mode': f"postgres/{quantization}",
+            'memory_mb': index_bytes(conn, index_name(table_name, INDEX_METHOD, quantization)) / 2**20,
+            'p50_ms': np.percentile(latency, 50) * 1000,
+            'p95_ms': np.percentile(latency, 95) * 1000,
+            f'recall@{args.k}': float(np.mean(recalls))
+        })
+    create_vector_index(conn, table_name)
+    return results
+
+
+def benchmark_numpy(chunking_strategy: str, embedding_model: str, args) -> list:
+    metadata, vectors = load_embeddings(chunking_strategy, embedding_model)
+    rows = np.random.default_rng(0).choice(len(vectors), args.n_queries, replace=False)
+    indexes = {
+        quantization: NumpyIndex(metadata, vectors, quantization)
+        for quantization in ['none', 'int8']
+    }
+    exact = {}
+    results = []
+    for quantization, index in indexes.items():
+        latency, recalls = [], []
+        for row in rows:
+            start = time.perf_counter()
+            movies = [movie for _, movie, _ in index.search(vectors[row], 0, 10000, None, args.k)]
+            latency.append(time.perf_counter() - start)
+            exact.setdefault(row, movies)
+            recalls.append(len(set(movies) & set(exact[row])) / max(len(exact[row]), 1))
+        results.append({
+            'table': get_table_name(chunking_strategy, embedding_model),
+            'mode': f"numpy/{quantization}",
+            'memory_mb': index.memory_bytes() / 2**20,
+            'p50_ms': np.percentile(latency, 50) * 1000,
+            'p95_ms': np.percentile(latency, 95) * 1000,
+            f'recall@{args.k}': float(np.mean(recalls))
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--n-queries', type=int, default=100)
+    parser.add_argument('--skip-postgres', action='store_true')
+    parser.add_argument('--skip-numpy', action='store_true')
+    parser.add_argument('--output', default=None, help='CSV file for the results')
+    args = parser.parse_args()
+
+    conn = None if args.skip_postgres else init_db()
+    results = []
+    for chunking_strategy in CHUNKING_STRATEGIES:
+        for embedding_model in EMBEDDING_MODELS:
+            table_results = []
+            if conn is not None:
+                table_results += benchmark_postgres(
+                    conn, get_table_name(chunking_strategy, embedding_model), args
+                )
+            if not args.skip_numpy:
+                table_results += benchmark_numpy(chunking_strategy, embedding_model, args)
+            for result in table_results:
+                print(' '.join(
+                    f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in result.items()
+                ))
+            results += table_results
+    if conn is not None:
+        conn.close()
+    if args.output:
+        pd.DataFrame(results).to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Micro-benchmark of the prepared, parameterized search statement against
+the same query built as a string with an inline ARRAY literal. Reports
+client round-trip time and the server-side planning/execution time from
+EXPLAIN ANALYZE.
+
+python benchmark_sql.py --chunking-strategy recursive-splitter --n-queries 200
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmark_ann import sample_queries
+from db_pool import ConnectionPool
+from pgvector import VectorDB
+
+
+def string_built_sql(sql: str, params: list) -> str:
+    """
+    The same statement with every parameter inlined as a literal, the
+    way search SQL used to be built, so it is parsed and planned anew.
+    """
+    for i, param in reversed(list(enumerate(params, start=1))):
+        if isinstance(param, np.ndarray):
+            param = f"ARRAY[{','.join(map(str, param.tolist()))}]"
+        sql = sql.replace(f"${i}", str(param))
+    return sql
+
+
+def timed(cur, sql: str, params=None) -> tuple:
+    start = time.perf_counter()
+    cur.execute(sql, params)
+    cur.fetchall()
+    elapsed = time.perf_counter() - start
+    cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+    plan = cur.fetchone()[0][0]
+    return elapsed, plan['Planning Time'], plan['Execution Time']
+
+
+def summarize(name: str, samples: list):
+    samples = np.array(samples) * [1000, 1, 1]
+    print(
+        f"{name}: round trip p50={np.percentile(samples[:, 0], 50):.2f}ms "
+        f"planning mean={samples[:, 1].mean():.3f}ms "
+        f"execution mean={samples[:, 2].mean():.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunking-strategy', default='recursive-splitter')
+    parser.add_argument('--embedding-model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--n-queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    table_name = VectorDB.get_table_name(args.chunking_strategy, args.embedding_model)
+    chunks_table = VectorDB.get_chunks_table(args.chunking_strategy)
+    pool = ConnectionPool(1, 1)
+    with pool.connection() as conn:
+        vectors = [
+            np.array(json.loads(v), dtype=np.float32)
+            for v in sample_queries(conn, table_name, args.n_queries)
+        ]
+
+    legacy, prepared = [], []
+    with pool.connection() as conn:
+        name, sql = VectorDB.search_statement(table_name, chunks_table, None)
+        pool.prepare(conn, name, sql)
+        cur = conn.cursor()
+        for vector in vectors:
+            params = [vector, 0, 2025, args.k*5, args.k]
+            legacy.append(timed(cur, string_built_sql(sql, params)))
+            prepared.append(timed(cur, f"EXECUTE {name} (%s, %s, %s, %s, %s);", params))
+        cur.close()
+
+    summarize('string-built', legacy)
+    summarize('prepared', prepared)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Load time and peak RSS of the CSV embeddings against the binary store.
+Each load runs in a fresh interpreter so peak RSS is not shared.
+
+python benchmark_store.py [--chunking-strategy ...] [--embedding-model ...]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from embedding_store import load_csv, load_store
+
+
+def measure(fmt: str, chunking_strategy: str, embedding_model: str):
+    loader = load_csv if fmt == 'csv' else load_store
+    start = time.perf_counter()
+    metadata, vectors = loader(chunking_strategy, embedding_model)
+    # touch every vector so the memory-mapped store is actually read
+    checksum = float(vectors.sum(dtype='float64'))
+    elapsed = time.perf_counter() - start
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        'format': fmt,
+        'rows': len(metadata),
+        'load_s': round(elapsed, 3),
+        'peak_rss_mb': round(peak_rss_mb, 1),
+        'checksum': checksum
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunking-strategy', default='recursive-splitter')
+    parser.add_argument('--embedding-model', default='all-MiniLM-L6-v2')
+    parser.add_argument('--format', choices=['csv', 'store'], default=None)
+    args = parser.parse_args()
+
+    if args.format:
+        measure(args.format, args.chunking_strategy, args.embedding_model)
+        return
+
+    for fmt in ['csv', 'store']:
+        subprocess.run([
+            sys.executable, __file__,
+            '--chunking-strategy', args.chunking_strategy,
+            '--embedding-model', args.embedding_model,
+            '--format', fmt
+        ], check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+CHECKPOINTS_TABLE = 'population_checkpoints'
+# content hash of every movie loaded into a strategy/model table
+MOVIE_HASHES_TABLE = 'movie_hashes'
+
+
+def init_checkpoints(conn):
+    cur = conn.cursor()
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {CHECKPOINTS_TABLE} (
+        table_name TEXT PRIMARY KEY,
+        content_hash TEXT,
+        loaded_rows INTEGER DEFAULT 0,
+        total_rows INTEGER DEFAULT 0,
+        completed BOOLEAN DEFAULT FALSE,
+        updated_at TIMESTAMP DEFAULT now()
+    );
+    """)
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {MOVIE_HASHES_TABLE} (
+        table_name TEXT,
+        movie_id INTEGER REFERENCES movies (id) ON DELETE CASCADE,
+        content_hash TEXT,
+        PRIMARY KEY (table_name, movie_id)
+    );
+    """)
+    conn.commit()
+    cur.close()
+
+
+def get_checkpoint(conn, table_name: str) -> dict:
+    cur = conn.cursor()
+    cur.execute(f"""
+    SELECT content_hash, loaded_rows, total_rows, completed
+    FROM {CHECKPOINTS_TABLE} WHERE table_name = %s;
+    """, (table_name,))
+    row = cur.fetchone()
+    cur.close()
+    if row is None:
+        return None
+    return {
+        'content_hash': row[0],
+        'loaded_rows': row[1],
+        'total_rows': row[2],
+        'completed': row[3]
+    }
+
+
+def save_checkpoint(
+        cur,
+        table_name: str,
+        content_hash: str,
+        loaded_rows: int,
+        total_rows: int,
+        completed: bool = False):
+    """
+    Upserts the checkpoint with the given cursor and does not commit, so
+    it can be written in the same transaction as the rows it describes.
+    """
+    cur.execute(f"""
+    INSERT INTO {CHECKPOINTS_TABLE}
+    (table_name, content_hash, loaded_rows, total_rows, completed, updated_at)
+    VALUES (%s, %s, %s, %s, %s, now())
+    ON CONFLICT (table_name) DO UPDATE SET
+        content_hash = EXCLUDED.content_hash,
+        loaded_rows = EXCLUDED.loaded_rows,
+        total_rows = EXCLUDED.total_rows,
+        completed = EXCLUDED.completed,
+        updated_at = EXCLUDED.updated_at;
+    """, (table_name, content_hash, loaded_rows, total_rows, completed))
+
+
+def mark_incomplete(conn, table_name: str):
+    """
+    Takes a table out of search while its rows are being replaced, until
+    the load saves a completed checkpoint again.
+    """
+    cur = conn.cursor()
+    cur.execute(f"""
+    UPDATE {CHECKPOINTS_TABLE} SET completed = FALSE, updated_at = now()
+    WHERE table_name = %s;
+    """, (table_name,))
+    conn.commit()
+    cur.close()
+
+
+def completed_tables(conn) -> set:
+    cur = conn.cursor()
+    cur.execute(f"SELECT table_name FROM {CHECKPOINTS_TABLE} WHERE completed;")
+    tables = {row[0] for row in cur.fetchall()}
+    cur.close()
+    return tables
+
+
+def get_movie_hashes(conn, table_name: str) -> dict:
+    """
+    (title, year) -> content hash of every movie with rows in the table,
+    None for movies loaded before movie hashes were recorded.
+    """
+    cur = conn.cursor()
+    cur.execute(f"""
+    SELECT m.title, m.year, h.content_hash
+    FROM (SELECT DISTINCT movie_id FROM {table_name}) e
+    JOIN movies m ON m.id = e.movie_id
+    LEFT JOIN {MOVIE_HASHES_TABLE} h ON h.table_name = %s AND h.movie_id = e.movie_id;
+    """, (table_name,))
+    hashes = {(title, year): content_hash for title, year, content_hash in cur.fetchall()}
+    cur.close()
+    return hashes
+
+
+def save_movie_hashes(cur, table_name: str, movie_hashes: dict):
+    """
+    Upserts (title, year) -> hash without committing, like save_checkpoint.
+    """
+    if not movie_hashes:
+        return
+    keys = list(movie_hashes)
+    cur.execute(f"""
+    INSERT INTO {MOVIE_HASHES_TABLE} (table_name, movie_id, content_hash)
+    SELECT %s, m.id, v.content_hash
+    FROM unnest(%s::text[], %s::integer[], %s::text[]) AS v(title, year, content_hash)
+    JOIN movies m ON m.title = v.title AND m.year = v.year
+    ON CONFLICT (table_name, movie_id) DO UPDATE SET content_hash = EXCLUDED.content_hash;
+    """, (
+        table_name,
+        [title for title, _ in keys],
+        [year for _, year in keys],
+        [movie_hashes[key] for key in keys]
+    ))
@@ -4,14 +4,14 @@ from dotenv import load_dotenv
 load_dotenv()
 
 
-def init_db():
-    HOST = os.getenv('HOST')
-    USER = os.getenv('USER')
-    PASSWORD = os.getenv('PASSWORD')
+def connection_params() -> dict:
+    return {
+        'host': os.getenv('HOST'),
+        'user': os.getenv('USER'),
+        'password': os.getenv('PASSWORD')
+    }
+
 
-    conn = psycopg2.connect(
-                        host=HOST,
-                        user=USER,
-                        password=PASSWORD
-                        )
-    return conn
\ No newline at end of file
+def init_db():
+    conn = psycopg2.connect(**connection_params())
+    return conn
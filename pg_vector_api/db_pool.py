@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import psycopg2
+from dotenv import load_dotenv
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+from db_initialization import connection_params
+from indexes import MAX_IDENTIFIER_LENGTH
+
+load_dotenv()
+
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '2'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+# connections idle for longer than this are pinged before being handed out
+DB_HEALTHCHECK_INTERVAL = float(os.getenv('DB_HEALTHCHECK_INTERVAL', '60'))
+
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class ConnectionPool:
+    """
+    Thread-safe psycopg2 pool. Callers wait for a free connection instead
+    of failing when all are checked out, broken connections are replaced
+    transparently and server-side prepared statements are tracked per
+    connection. That state is keyed on the connection objects themselves
+    and dropped when the pool closes one, so a new connection never
+    inherits the statements of a closed one.
+    """
+    def __init__(
+            self,
+            minconn: int = DB_POOL_MIN,
+            maxconn: int = DB_POOL_MAX,
+            timeout: float = DB_POOL_TIMEOUT) -> None:
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.pool = ThreadedConnectionPool(minconn, maxconn, **connection_params())
+        self.slots = threading.BoundedSemaphore(maxconn)
+        self.lock = threading.Lock()
+        self.prepared = weakref.WeakKeyDictionary()
+        self.last_used = weakref.WeakKeyDictionary()
+        self.counters = {
+            'checkouts': 0,
+            'in_use': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'reconnects': 0
+        }
+
+    @contextmanager
+    def connection(self):
+        """
+        Yields a healthy connection, commits when the block succeeds and
+        rolls back otherwise. Connections that failed at the socket level
+        are closed instead of being returned to the pool.
+        """
+        start = time.perf_counter()
+        if not self.slots.acquire(timeout=self.timeout):
+            raise PoolError(f"No connection available after {self.timeout}s")
+        self.record_wait(time.perf_counter() - start)
+        try:
+            conn = self.checkout()
+        except Exception:
+            self.slots.release()
+            raise
+        try:
+            yield conn
+            conn.commit()
+        except CONNECTION_ERRORS:
+            self.discard(conn)
+            raise
+        except Exception:
+            try:
+                conn.rollback()
+            except CONNECTION_ERRORS:
+                self.discard(conn)
+                raise
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+        finally:
+            with self.lock:
+                self.counters['in_use'] -= 1
+            self.slots.release()
+
+    def run(self, fn, retries: int = 1):
+        """
+        Calls fn(conn) inside a transaction, retrying on a fresh connection
+        when the server connection was lost.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.connection() as conn:
+                    return fn(conn)
+            except CONNECTION_ERRORS:
+                if attempt == retries:
+                    raise
+                with self.lock:
+                    self.counters['reconnects'] += 1
+
+    def checkout(self):
+        conn = self.pool.getconn()
+        with self.lock:
+            idle = time.monotonic() - self.last_used.get(conn, time.monotonic())
+        if conn.closed or (idle > DB_HEALTHCHECK_INTERVAL and not self.is_healthy(conn)):
+            self.discard(conn)
+            conn = self.pool.getconn()
+            with self.lock:
+                self.counters['reconnects'] += 1
+        with self.lock:
+            self.counters['checkouts'] += 1
+            self.counters['in_use'] += 1
+        return conn
+
+    def release(self, conn):
+        with self.lock:
+            self.last_used[conn] = time.monotonic()
+        self.pool.putconn(conn)
+        # putconn closes connections past the minconn idle ones
+        if conn.closed:
+            self.forget(conn)
+
+    def discard(self, conn):
+        self.forget(conn)
+        self.pool.putconn(conn, close=True)
+
+    def forget(self, conn):
+        with self.lock:
+            self.prepared.pop(conn, None)
+            self.last_used.pop(conn, None)
+
+    @staticmethod
+    def is_healthy(conn) -> bool:
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1;")
+            cur.close()
+            conn.rollback()
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    def prepare(self, conn, name: str, sql: str):
+        """
+        Creates the prepared statement on this connection once. Must be
+        called before anything else runs in the current transaction.
+        """
+        # a truncated name would be looked up and executed as another statement
+        if len(name.encode()) > MAX_IDENTIFIER_LENGTH:
+            raise ValueError(f"Statement name too long: {name}")
+        with self.lock:
+            prepared = self.prepared.setdefault(conn, set())
+        if name in prepared:
+            return
+        cur = conn.cursor()
+        cur.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s;", (name,))
+        if cur.fetchone() is None:
+            cur.execute(f"PREPARE {name} AS {sql}")
+        conn.commit()
+        cur.close()
+        prepared.add(name)
+
+    def record_wait(self, seconds: float):
+        with self.lock:
+            if seconds > 0.001:
+                self.counters['waits'] += 1
+            self.counters['wait_seconds'] += seconds
+            self.counters['max_wait_seconds'] = max(
+                self.counters['max_wait_seconds'], seconds
+            )
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'max_size': self.maxconn,
+                **self.counters,
+                'saturation': round(self.counters['in_use'] / self.maxconn, 2)
+            }
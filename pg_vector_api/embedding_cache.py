@@ -0,0 +1,105 @@
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_CACHE_SIZE = int(os.getenv('EMBEDDING_CACHE_SIZE', '10000'))
+# empty path keeps the cache in memory only
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', '')
+
+
+def normalize_query(text: str) -> str:
+    """
+    Case is kept since gtr-t5-base is a cased model, only unicode form
+    and whitespace are normalized.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+class EmbeddingCache:
+    """
+    Bounded in-process LRU of query embeddings keyed by
+    (model, normalized query), backed by an optional SQLite file that
+    survives restarts and is shared between workers.
+    """
+    def __init__(
+            self,
+            max_size: int = EMBEDDING_CACHE_SIZE,
+            path: str = EMBEDDING_CACHE_PATH) -> None:
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+        self.db = None
+        if path:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT,
+                query TEXT,
+                vector BLOB,
+                PRIMARY KEY (model, query)
+            );
+            """)
+            self.db.commit()
+
+    def get(self, model: str, query: str) -> np.ndarray:
+        key = (model, normalize_query(query))
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return self.entries[key]
+            vector = self.get_from_disk(key)
+            if vector is None:
+                self.counters['misses'] += 1
+                return None
+            self.counters['disk_hits'] += 1
+            self.put_in_memory(key, vector)
+            return vector
+
+    def put(self, model: str, query: str, vector: np.ndarray):
+        key = (model, normalize_query(query))
+        vector = np.asarray(vector, dtype=np.float32)
+        with self.lock:
+            self.put_in_memory(key, vector)
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?);",
+                    (key[0], key[1], vector.tobytes())
+                )
+                self.db.commit()
+
+    def put_in_memory(self, key: tuple, vector: np.ndarray):
+        self.entries[key] = vector
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def get_from_disk(self, key: tuple) -> np.ndarray:
+        if self.db is None:
+            return None
+        row = self.db.execute(
+            "SELECT vector FROM embeddings WHERE model = ? AND query = ?;", key
+        ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = sum(self.counters.values())
+            hits = self.counters['hits'] + self.counters['disk_hits']
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'persistent': self.db is not None,
+                **self.counters,
+                'hit_rate': round(hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,138 @@
+"""
+Binary embedding store. Every strategy/model directory holds
+
+    vectors.npy       float32 matrix (n_chunks, dim), memory-mapped on load
+    metadata.parquet  title, year, genres, description, row i <-> vectors[i]
+
+Convert the existing CSVs once with
+
+python embedding_store.py [--dataset ../streamlit/data.csv]
+"""
+import argparse
+import ast
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+EMBEDDINGS_DIR = os.getenv('EMBEDDINGS_DIR', 'embeddings')
+METADATA_COLUMNS = ['title', 'year', 'genres', 'description']
+
+
+def store_dir(chunking_strategy: str, embedding_model: str) -> str:
+    return os.path.join(EMBEDDINGS_DIR, chunking_strategy, embedding_model)
+
+
+def csv_path(chunking_strategy: str, embedding_model: str) -> str:
+    return os.path.join(store_dir(chunking_strategy, embedding_model), 'embeddings.csv')
+
+
+def vectors_path(chunking_strategy: str, embedding_model: str) -> str:
+    return os.path.join(store_dir(chunking_strategy, embedding_model), 'vectors.npy')
+
+
+def metadata_path(chunking_strategy: str, embedding_model: str) -> str:
+    return os.path.join(store_dir(chunking_strategy, embedding_model), 'metadata.parquet')
+
+
+def store_exists(chunking_strategy: str, embedding_model: str) -> bool:
+    return os.path.exists(vectors_path(chunking_strategy, embedding_model)) and \
+        os.path.exists(metadata_path(chunking_strategy, embedding_model))
+
+
+def source_paths(chunking_strategy: str, embedding_model: str) -> list:
+    if store_exists(chunking_strategy, embedding_model):
+        return [
+            vectors_path(chunking_strategy, embedding_model),
+            metadata_path(chunking_strategy, embedding_model)
+        ]
+    return [csv_path(chunking_strategy, embedding_model)]
+
+
+def content_hash(chunking_strategy: str, embedding_model: str) -> str:
+    """
+    sha256 over the files the table is loaded from.
+    """
+    digest = hashlib.sha256()
+    for path in source_paths(chunking_strategy, embedding_model):
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def load_csv(chunking_strategy: str, embedding_model: str) -> tuple:
+    df = pd.read_csv(csv_path(chunking_strategy, embedding_model))
+    df['genres'] = df['genres'].apply(ast.literal_eval)
+    vectors = np.array(
+        df['embedding'].apply(ast.literal_eval).tolist(), dtype=np.float32
+    )
+    return df[METADATA_COLUMNS], vectors
+
+
+def load_store(chunking_strategy: str, embedding_model: str) -> tuple:
+    """
+    Returns the metadata dataframe and a read-only memory-mapped
+    float32 matrix of the chunk vectors.
+    """
+    metadata = pd.read_parquet(
+        metadata_path(chunking_strategy, embedding_model), memory_map=True
+    )
+    metadata['genres'] = metadata['genres'].map(list)
+    vectors = np.load(vectors_path(chunking_strategy, embedding_model), mmap_mode='r')
+    return metadata, vectors
+
+
+def load_embeddings(chunking_strategy: str, embedding_model: str) -> tuple:
+    if store_exists(chunking_strategy, embedding_model):
+        return load_store(chunking_strategy, embedding_model)
+    return load_csv(chunking_strategy, embedding_model)
+
+
+def write_store(
+        chunking_strategy: str,
+        embedding_model: str,
+        metadata: pd.DataFrame,
+        vectors: np.ndarray):
+    os.makedirs(store_dir(chunking_strategy, embedding_model), exist_ok=True)
+    np.save(
+        vectors_path(chunking_strategy, embedding_model),
+        np.ascontiguousarray(vectors, dtype=np.float32)
+    )
+    metadata[METADATA_COLUMNS].reset_index(drop=True).to_parquet(
+        metadata_path(chunking_strategy, embedding_model), index=False
+    )
+
+
+def convert_csv(chunking_strategy: str, embedding_model: str):
+    metadata, vectors = load_csv(chunking_strategy, embedding_model)
+    write_store(chunking_strategy, embedding_model, metadata, vectors)
+    print(f"{chunking_strategy}/{embedding_model}: {vectors.shape[0]} x {vectors.shape[1]} converted")
+
+
+def convert_dataset(path: str):
+    """
+    Converts the movies dataset used by the Streamlit app to Parquet.
+    """
+    df = pd.read_csv(path)
+    df['genres'] = df['genres'].apply(ast.literal_eval)
+    df.to_parquet(os.path.splitext(path)[0] + '.parquet', index=False)
+
+
+def main():
+    from populate_db import CHUNKING_STRATEGIES, EMBEDDING_MODELS
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset', default=None)
+    args = parser.parse_args()
+
+    for chunking_strategy in CHUNKING_STRATEGIES:
+        for embedding_model in EMBEDDING_MODELS:
+            convert_csv(chunking_strategy, embedding_model)
+    if args.dataset:
+        convert_dataset(args.dataset)
+
+
+if __name__ == '__main__':
+    main()
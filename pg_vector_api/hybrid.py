@@ -0,0 +1,103 @@
+import os
+
+from dotenv import load_dotenv
+
+from indexes import short_identifier
+
+load_dotenv()
+
+RRF_K = int(os.getenv('RRF_K', '60'))
+# movies taken from each ranked list before fusion
+HYBRID_DEPTH = int(os.getenv('HYBRID_DEPTH', '50'))
+SEARCH_MODES = ['vector', 'hybrid']
+
+# plainto_tsquery ANDs every term, long descriptive queries need OR
+OR_TSQUERY = "replace(plainto_tsquery('english', $1)::text, '&', '|')::tsquery"
+
+
+def filters_sql(genre: str) -> str:
+    """
+    Year/genre filters on movies m with parameters $2, $3 and $5.
+    """
+    sql = "m.year >= $2 AND m.year <= $3"
+    if genre:
+        sql += " AND m.genres @> ARRAY[$5::genre_type]"
+    return sql
+
+
+def title_statement(genre: str, trigram: bool) -> tuple:
+    """
+    Movies ranked by their title, parameters (text, min_year, max_year,
+    limit[, genre]). Trigram similarity is used for an extracted title,
+    which tolerates typos and partial titles, full-text search otherwise.
+    """
+    name = "lexical_title_trgm" if trigram else "lexical_title_fts"
+    if genre:
+        name += "_genre"
+    if trigram:
+        match, score = "m.title % $1", "similarity(m.title, $1)"
+    else:
+        match, score = f"m.title_tsv @@ {OR_TSQUERY}", f"ts_rank_cd(m.title_tsv, {OR_TSQUERY})"
+    sql = f"""
+    SELECT m.id
+    FROM movies m
+    WHERE {match} AND {filters_sql(genre)}
+    ORDER BY {score} DESC
+    LIMIT $4;
+    """
+    return name, sql
+
+
+def description_statement(chunks_table: str, genre: str) -> tuple:
+    """
+    Movies ranked by the full-text score of their best chunk, parameters
+    (text, min_year, max_year, limit[, genre]).
+    """
+    name = f"lexical_{chunks_table}"
+    if genre:
+        name += "_genre"
+    name = short_identifier(name)
+    sql = f"""
+    SELECT c.movie_id
+    FROM {chunks_table} c
+    JOIN movies m ON m.id = c.movie_id
+    WHERE c.description_tsv @@ {OR_TSQUERY} AND {filters_sql(genre)}
+    GROUP BY c.movie_id
+    ORDER BY max(ts_rank_cd(c.description_tsv, {OR_TSQUERY})) DESC
+    LIMIT $4;
+    """
+    return name, sql
+
+
+def best_chunks_statement(table_name: str, chunks_table: str) -> tuple:
+    """
+    Closest chunk to the query vector for each of the given movies,
+    parameters (vector, movie_ids), columns as the vector search.
+    """
+    name = short_identifier(f"best_chunks_{table_name}")
+    sql = f"""
+    SELECT best.chunk_id, m.title, m.year, m.genres, c.description, best.distance,
+           NULL, NULL, best.movie_id
+    FROM (
+        SELECT DISTINCT ON (e.movie_id) e.chunk_id, e.movie_id,
+               e.feature_vector <=> $1::vector AS distance
+        FROM {table_name} e
+        WHERE e.movie_id = ANY($2::integer[])
+        ORDER BY e.movie_id, e.feature_vector <=> $1::vector
+    ) best
+    JOIN {chunks_table} c ON c.id = best.chunk_id
+    JOIN movies m ON m.id = best.movie_id;
+    """
+    return name, sql
+
+
+def reciprocal_rank_fusion(rankings: list, k: int) -> list:
+    """
+    Fuses ranked lists of ids with score sum(1 / (RRF_K + rank)) and
+    returns the top-k ids.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1 / (RRF_K + rank)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
@@ -0,0 +1,285 @@
+import hashlib
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+INDEX_METHODS = ['hnsw', 'ivfflat']
+# the index is built over a quantized expression of feature_vector, the
+# float32 column stays in the table for re-ranking the shortlist
+QUANTIZATION_MODES = ['none', 'halfvec', 'binary']
+
+INDEX_METHOD = os.getenv('INDEX_METHOD', 'hnsw').lower()
+HNSW_M = int(os.getenv('HNSW_M', '16'))
+HNSW_EF_CONSTRUCTION = int(os.getenv('HNSW_EF_CONSTRUCTION', '64'))
+HNSW_EF_SEARCH = int(os.getenv('HNSW_EF_SEARCH', '40'))
+IVFFLAT_LISTS = int(os.getenv('IVFFLAT_LISTS', '0'))
+IVFFLAT_PROBES = int(os.getenv('IVFFLAT_PROBES', '10'))
+# pgvector rejects a larger hnsw.ef_search
+MAX_EF_SEARCH = 1000
+# lists of an IVFFlat index created without the option
+IVFFLAT_DEFAULT_LISTS = 100
+MAINTENANCE_WORK_MEM = os.getenv('MAINTENANCE_WORK_MEM', '1GB')
+# relaxed_order or strict_order, empty for pgvector versions before 0.8
+ITERATIVE_SCAN = os.getenv('ITERATIVE_SCAN', '')
+# whether filtered index scans of INDEX_METHOD keep going past ef_search/probes
+ITERATIVE_SCAN_ACTIVE = bool(ITERATIVE_SCAN) and (
+    INDEX_METHOD == 'hnsw' or ITERATIVE_SCAN == 'relaxed_order'
+)
+VECTOR_QUANTIZATION = os.getenv('VECTOR_QUANTIZATION', 'none').lower()
+# PostgreSQL silently truncates longer identifiers
+MAX_IDENTIFIER_LENGTH = 63
+
+
+def short_identifier(name: str) -> str:
+    """
+    name when it fits in an identifier, otherwise its head followed by a
+    hash of the full name, so names that only differ past the limit stay
+    distinct instead of being truncated to the same identifier.
+    """
+    if len(name.encode()) <= MAX_IDENTIFIER_LENGTH:
+        return name
+    digest = hashlib.sha1(name.encode()).hexdigest()[:12]
+    return f"{name[:MAX_IDENTIFIER_LENGTH - len(digest) - 1]}_{digest}"
+
+
+def index_name(table_name: str, method: str, quantization: str = 'none') -> str:
+    """
+    Shortened like statement names, a truncated name would never match
+    the one pg_indexes reports and the index would be rebuilt every run.
+    """
+    if quantization == 'none':
+        return short_identifier(f"{table_name}_{method}_idx")
+    return short_identifier(f"{table_name}_{method}_{quantization}_idx")
+
+
+def vector_dims(conn, table_name: str) -> int:
+    """
+    Declared dimension of feature_vector, stored by pgvector as the typmod.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+    SELECT atttypmod FROM pg_attribute
+    WHERE attrelid = %s::regclass AND attname = 'feature_vector';
+    """, (table_name.lower(),))
+    dims = cur.fetchone()[0]
+    cur.close()
+    return dims
+
+
+def indexed_expression(quantization: str, dims: int, column: str = 'feature_vector') -> str:
+    if quantization == 'halfvec':
+        return f"({column}::halfvec({dims}))"
+    if quantization == 'binary':
+        return f"(binary_quantize({column})::bit({dims}))"
+    return column
+
+
+def quantized_distance(quantization: str, dims: int, column: str, query: str) -> str:
+    """
+    Distance between column and the query vector that matches the
+    operator class of the quantized index.
+    """
+    if quantization == 'halfvec':
+        return f"{column}::halfvec({dims}) <=> {query}::halfvec({dims})"
+    if quantization == 'binary':
+        return f"binary_quantize({column})::bit({dims}) <~> binary_quantize({query})::bit({dims})"
+    return f"{column} <=> {query}"
+
+
+def ivfflat_lists(n_rows: int) -> int:
+    """
+    pgvector recommends rows / 1000 lists up to 1M rows
+    and sqrt(rows) above that.
+    """
+    if IVFFLAT_LISTS > 0:
+        return IVFFLAT_LISTS
+    if n_rows <= 1_000_000:
+        return max(n_rows // 1000, 1)
+    return int(n_rows ** 0.5)
+
+
+def count_rows(conn, table_name: str) -> int:
+    sql = f"SELECT COUNT(*) FROM {table_name}"
+    cur = conn.cursor()
+    cur.execute(sql)
+    row_count = cur.fetchone()[0]
+    cur.close()
+    return row_count
+
+
+def existing_indexes(conn, table_name: str) -> list:
+    sql = """
+    SELECT indexname FROM pg_indexes
+    WHERE tablename = %s AND indexdef LIKE %s;
+    """
+    cur = conn.cursor()
+    cur.execute(sql, (table_name.lower(), '%feature_vector%'))
+    names = [row[0] for row in cur.fetchall()]
+    cur.close()
+    return names
+
+
+def index_lists(conn, table_name: str) -> int:
+    """
+    Number of lists of the IVFFlat index on the table, 0 without one.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+    SELECT c.reloptions FROM pg_index i
+    JOIN pg_class c ON c.oid = i.indexrelid
+    JOIN pg_am a ON a.oid = c.relam
+    WHERE i.indrelid = %s::regclass AND a.amname = 'ivfflat';
+    """, (table_name.lower(),))
+    row = cur.fetchone()
+    cur.close()
+    if row is None:
+        return 0
+    for option in row[0] or []:
+        if option.startswith('lists='):
+            return int(option[len('lists='):])
+    return IVFFLAT_DEFAULT_LISTS
+
+
+def drop_vector_index(conn, table_name: str):
+    cur = conn.cursor()
+    for name in existing_indexes(conn, table_name):
+        cur.execute(f"DROP INDEX IF EXISTS {name};")
+    conn.commit()
+    cur.close()
+
+
+def reset_vector_dims(conn, table_name: str, dims: int):
+    """
+    Empties the table and retypes feature_vector to VECTOR(dims).
+    """
+    drop_vector_index(conn, table_name)
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM {table_name};")
+    cur.execute(f"ALTER TABLE {table_name} ALTER COLUMN feature_vector TYPE VECTOR({int(dims)});")
+    conn.commit()
+    cur.close()
+
+
+def create_vector_index(
+        conn,
+        table_name: str,
+        method: str = INDEX_METHOD,
+        quantization: str = VECTOR_QUANTIZATION):
+    """
+    (Re)builds the ANN index over feature_vector, or over its halfvec or
+    binary quantization. Any other vector index on the table is dropped
+    first, so a table has at most one.
+    """
+    if method == 'none':
+        drop_vector_index(conn, table_name)
+        return
+    if method not in INDEX_METHODS:
+        raise ValueError(f"Unknown index method: {method}")
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    name = index_name(table_name, method, quantization)
+    if name.lower() in existing_indexes(conn, table_name):
+        return
+    drop_vector_index(conn, table_name)
+
+    if method == 'hnsw':
+        params = f"m = {HNSW_M}, ef_construction = {HNSW_EF_CONSTRUCTION}"
+    else:
+        params = f"lists = {ivfflat_lists(count_rows(conn, table_name))}"
+    expression = indexed_expression(quantization, vector_dims(conn, table_name))
+    ops = {
+        'none': 'vector_cosine_ops',
+        'halfvec': 'halfvec_cosine_ops',
+        'binary': 'bit_hamming_ops'
+    }[quantization]
+
+    cur = conn.cursor()
+    cur.execute(f"SET maintenance_work_mem = '{MAINTENANCE_WORK_MEM}';")
+    cur.execute(f"""
+    CREATE INDEX IF NOT EXISTS {name} ON {table_name}
+    USING {method} ({expression} {ops})
+    WITH ({params});
+    """)
+    cur.execute("RESET maintenance_work_mem;")
+    conn.commit()
+    cur.close()
+
+
+def create_movie_indexes(conn):
+    """
+    B-tree on movies.year and GIN on movies.genres for the metadata filters.
+    """
+    cur = conn.cursor()
+    cur.execute("CREATE INDEX IF NOT EXISTS movies_year_idx ON movies (year);")
+    cur.execute("CREATE INDEX IF NOT EXISTS movies_genres_idx ON movies USING gin (genres);")
+    conn.commit()
+    cur.close()
+
+
+def create_text_indexes(conn, chunks_tables: list):
+    """
+    Full-text columns and GIN indexes for hybrid search, also added to
+    databases created before they were part of create_tables.sql.
+    """
+    cur = conn.cursor()
+    cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+    cur.execute("""
+    ALTER TABLE movies ADD COLUMN IF NOT EXISTS title_tsv TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('english', title)) STORED;
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS movies_title_tsv_idx ON movies USING gin (title_tsv);")
+    cur.execute("CREATE INDEX IF NOT EXISTS movies_title_trgm_idx ON movies USING gin (title gin_trgm_ops);")
+    for chunks_table in chunks_tables:
+        cur.execute(f"""
+        ALTER TABLE {chunks_table} ADD COLUMN IF NOT EXISTS description_tsv TSVECTOR
+        GENERATED ALWAYS AS (to_tsvector('english', coalesce(description, ''))) STORED;
+        """)
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS {chunks_table}_description_tsv_idx
+        ON {chunks_table} USING gin (description_tsv);
+        """)
+    conn.commit()
+    cur.close()
+
+
+def create_filter_indexes(conn, table_name: str):
+    """
+    Index on movie_id of the vector table, so selective filters can be
+    answered by scanning only the chunks of matching movies.
+    """
+    cur = conn.cursor()
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {table_name}_movie_id_idx ON {table_name} (movie_id);")
+    cur.execute("ANALYZE movies;")
+    cur.execute(f"ANALYZE {table_name};")
+    conn.commit()
+    cur.close()
+
+
+def set_search_params(
+        cur,
+        ef_search: int = None,
+        probes: int = None,
+        limit: int = 0,
+        lists: int = 0):
+    """
+    Applies per-request ANN parameters for the current transaction only.
+    HNSW returns at most ef_search rows, so it is raised up to the limit,
+    within the 1..MAX_EF_SEARCH pgvector accepts. probes is capped at the
+    lists of the index when known.
+    When ITERATIVE_SCAN is set (pgvector >= 0.8), filtered index scans
+    keep going until enough rows pass the filters.
+    """
+    ef_search = min(max(ef_search or HNSW_EF_SEARCH, limit, 1), MAX_EF_SEARCH)
+    probes = max(probes or IVFFLAT_PROBES, 1)
+    if lists:
+        probes = min(probes, lists)
+    cur.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)};")
+    cur.execute(f"SET LOCAL ivfflat.probes = {int(probes)};")
+    if ITERATIVE_SCAN:
+        cur.execute(f"SET LOCAL hnsw.iterative_scan = {ITERATIVE_SCAN};")
+        if ITERATIVE_SCAN == 'relaxed_order':
+            cur.execute(f"SET LOCAL ivfflat.iterative_scan = {ITERATIVE_SCAN};")
@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from dotenv import load_dotenv
+from sentence_transformers import SentenceTransformer
+
+load_dotenv()
+
+PRELOAD_MODELS = [
+    name.strip() for name in os.getenv('PRELOAD_MODELS', '').split(',')
+    if name.strip()
+]
+# 0 keeps every model that was ever requested
+MODEL_MEMORY_BUDGET_MB = float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0'))
+
+
+def model_size_mb(model: SentenceTransformer) -> float:
+    n_bytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    n_bytes += sum(b.numel() * b.element_size() for b in model.buffers())
+    return n_bytes / 2**20
+
+
+class ModelRegistry:
+    """
+    Loads SentenceTransformer models on first use and evicts the least
+    recently used ones once their weights exceed the memory budget.
+    """
+    def __init__(
+            self,
+            model_names: list,
+            memory_budget_mb: float = MODEL_MEMORY_BUDGET_MB,
+            preload: list = PRELOAD_MODELS) -> None:
+        self.model_names = list(model_names)
+        self.memory_budget_mb = memory_budget_mb
+        self.models = OrderedDict()
+        self.sizes = {}
+        self.lock = threading.Lock()
+        self.loading_locks = {name: threading.Lock() for name in self.model_names}
+        self.events = deque(maxlen=100)
+        self.counters = {
+            'hits': 0,
+            'loads': 0,
+            'evictions': 0,
+            'load_seconds': 0.0
+        }
+        for name in preload:
+            self.get(name)
+
+    def __getitem__(self, name: str) -> SentenceTransformer:
+        return self.get(name)
+
+    def get(self, name: str) -> SentenceTransformer:
+        if name not in self.loading_locks:
+            raise KeyError(f"Unknown embedding model: {name}")
+        with self.lock:
+            if name in self.models:
+                self.models.move_to_end(name)
+                self.counters['hits'] += 1
+                return self.models[name]
+
+        # only one thread loads a given model, the others wait for it
+        with self.loading_locks[name]:
+            with self.lock:
+                if name in self.models:
+                    self.models.move_to_end(name)
+                    self.counters['hits'] += 1
+                    return self.models[name]
+            start = time.perf_counter()
+            model = SentenceTransformer(name)
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.models[name] = model
+                self.sizes[name] = model_size_mb(model)
+                self.counters['loads'] += 1
+                self.counters['load_seconds'] += elapsed
+                self.record('load', name, elapsed)
+                self.evict()
+            return model
+
+    def evict(self):
+        """
+        Drops least recently used models until the budget is met. The most
+        recently used model is never evicted. Must be called under self.lock.
+        """
+        if self.memory_budget_mb <= 0:
+            return
+        while len(self.models) > 1 and self.used_mb() > self.memory_budget_mb:
+            name, _ = self.models.popitem(last=False)
+            self.sizes.pop(name, None)
+            self.counters['evictions'] += 1
+            self.record('evict', name)
+
+    def used_mb(self) -> float:
+        return sum(self.sizes.values())
+
+    def record(self, event: str, name: str, seconds: float = 0.0):
+        self.events.append({
+            'event': event,
+            'model': name,
+            'seconds': round(seconds, 3),
+            'time': time.time()
+        })
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'loaded': list(self.models),
+                'used_mb': round(self.used_mb(), 1),
+                'budget_mb': self.memory_budget_mb,
+                **self.counters,
+                'events': list(self.events)
+            }
@@ -0,0 +1,240 @@
+"""
+In-process search over the binary embedding store. Every strategy/model
+matrix is memory-mapped once, its inverse row norms are precomputed, and
+a search is one matrix-vector product plus a per-movie max and an
+argpartition over the movies passing the year/genre masks.
+"""
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from embedding_store import load_embeddings, source_paths
+from projection import is_projected, project, projection_path
+
+load_dotenv()
+
+# pgvector or numpy
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'pgvector').lower()
+# none or int8, int8 keeps a scalar quantized copy in memory and re-ranks
+# the shortlisted movies with the memory-mapped float32 vectors
+NUMPY_QUANTIZATION = os.getenv('NUMPY_QUANTIZATION', 'none').lower()
+RERANK_FACTOR = int(os.getenv('RERANK_FACTOR', '4'))
+QUANTIZE_BLOCK_ROWS = 65536
+
+
+class NumpyIndex:
+    """
+    Chunk vectors of one strategy/model table with movie-level metadata.
+    Chunks are grouped by (title, year) like rows of the movies table, so
+    the best chunk per movie is a maximum over contiguous segments.
+    """
+    def __init__(
+            self,
+            metadata: pd.DataFrame,
+            vectors: np.ndarray,
+            quantization: str = NUMPY_QUANTIZATION) -> None:
+        self.vectors = vectors
+        norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+        self.inv_norms = np.divide(
+            1.0, norms, out=np.zeros_like(norms), where=norms > 0
+        )
+        years = pd.to_numeric(metadata['year'], errors='coerce')
+        keys = metadata['title'].astype(str) + '\x00' + years.astype(str)
+        movie_codes, _ = pd.factorize(keys)
+        # chunks sorted by movie, segment i spans order[starts[i]:starts[i+1]]
+        self.order = np.argsort(movie_codes, kind='stable')
+        sorted_codes = movie_codes[self.order]
+        self.starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        self.ends = np.r_[self.starts[1:], len(self.order)]
+
+        first_rows = self.order[self.starts]
+        self.titles = metadata['title'].to_numpy()[first_rows]
+        self.years = years.to_numpy(dtype=np.float64)[first_rows]
+        self.genres = [list(genres) for genres in metadata['genres'].to_numpy()[first_rows]]
+        self.descriptions = metadata['description'].to_numpy()
+        self.genre_masks = {}
+        for i, genres in enumerate(self.genres):
+            for genre in genres:
+                self.genre_masks.setdefault(genre, np.zeros(len(first_rows), dtype=bool))[i] = True
+        self.codes, self.scales = None, None
+        if quantization == 'int8':
+            self.quantize()
+
+    def quantize(self):
+        """
+        Symmetric per-dimension int8 quantization of the normalized
+        vectors, computed block by block to keep the float32 working set
+        bounded.
+        """
+        n_rows, dims = self.vectors.shape
+        scales = np.zeros(dims, dtype=np.float32)
+        for start in range(0, n_rows, QUANTIZE_BLOCK_ROWS):
+            block = self.normalized_rows(slice(start, start + QUANTIZE_BLOCK_ROWS))
+            scales = np.maximum(scales, np.abs(block).max(axis=0))
+        scales = np.where(scales > 0, scales / 127, 1.0).astype(np.float32)
+        self.codes = np.empty((n_rows, dims), dtype=np.int8)
+        for start in range(0, n_rows, QUANTIZE_BLOCK_ROWS):
+            rows = slice(start, start + QUANTIZE_BLOCK_ROWS)
+            self.codes[rows] = np.clip(
+                np.rint(self.normalized_rows(rows) / scales), -127, 127
+            )
+        self.scales = scales
+
+    def normalized_rows(self, rows) -> np.ndarray:
+        return np.asarray(self.vectors[rows], dtype=np.float32) * self.inv_norms[rows, None]
+
+    def similarities(self, query_vector: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity of every chunk to the normalized query, from the
+        int8 codes when the index is quantized.
+        """
+        if self.codes is None:
+            return (self.vectors @ query_vector) * self.inv_norms
+        scaled_query = query_vector * self.scales
+        similarities = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), QUANTIZE_BLOCK_ROWS):
+            rows = slice(start, start + QUANTIZE_BLOCK_ROWS)
+            similarities[rows] = self.codes[rows].astype(np.float32) @ scaled_query
+        return similarities
+
+    def movie_mask(self, min_year: int, max_year: int, genre: str) -> np.ndarray:
+        # NaN years fail both comparisons, as NULL years do in SQL
+        mask = (self.years >= min_year) & (self.years <= max_year)
+        if genre:
+            genre_mask = self.genre_masks.get(genre)
+            if genre_mask is None:
+                return np.zeros_like(mask)
+            mask &= genre_mask
+        return mask
+
+    def search(
+            self,
+            query_vector: np.ndarray,
+            min_year: int,
+            max_year: int,
+            genre: str,
+            k: int) -> list:
+        """
+        Top-k movies by cosine similarity of their closest chunk, as
+        (chunk_row, movie, similarity) sorted by similarity.
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        query_norm = np.linalg.norm(query_vector)
+        if query_norm == 0 or len(self.order) == 0 or k <= 0:
+            return []
+        query_vector = query_vector / query_norm
+        similarities = self.similarities(query_vector)
+        movie_similarities = np.maximum.reduceat(similarities[self.order], self.starts)
+        candidates = np.flatnonzero(self.movie_mask(min_year, max_year, genre))
+        if len(candidates) == 0:
+            return []
+        if self.codes is None:
+            movies = self.top_movies(candidates, movie_similarities[candidates], k)
+            return [self.best_chunk(movie, similarities) for movie in movies]
+
+        # int8 scores pick a shortlist, float32 vectors decide its order
+        shortlist = self.top_movies(candidates, movie_similarities[candidates], k*RERANK_FACTOR)
+        rows = np.concatenate([self.movie_rows(movie) for movie in shortlist])
+        exact = np.zeros(len(similarities), dtype=np.float32)
+        exact[rows] = (np.asarray(self.vectors[rows], dtype=np.float32) @ query_vector) * self.inv_norms[rows]
+        results = [self.best_chunk(movie, exact) for movie in shortlist]
+        results.sort(key=lambda result: -result[2])
+        return results[:k]
+
+    @staticmethod
+    def top_movies(candidates: np.ndarray, scores: np.ndarray, k: int) -> np.ndarray:
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(candidates))
+        return candidates[top[np.argsort(-scores[top], kind='stable')]]
+
+    def movie_rows(self, movie: int) -> np.ndarray:
+        return self.order[self.starts[movie]:self.ends[movie]]
+
+    def best_chunk(self, movie: int, similarities: np.ndarray) -> tuple:
+        rows = self.movie_rows(movie)
+        best_row = rows[np.argmax(similarities[rows])]
+        return best_row, movie, float(similarities[best_row])
+
+    def memory_bytes(self) -> int:
+        """
+        Bytes searched per query: the int8 codes when quantized,
+        the float32 matrix otherwise.
+        """
+        if self.codes is not None:
+            return self.codes.nbytes
+        return self.vectors.nbytes
+
+
+class NumpyBackend:
+    """
+    Loads one NumpyIndex per strategy/model table on first use and
+    reloads it when the store files or the projection change.
+    """
+    def __init__(self) -> None:
+        self.indexes = {}
+        self.lock = threading.Lock()
+        self.loading_locks = {}
+
+    def is_ready(self, chunking_strategy: str, embedding_model: str) -> bool:
+        return all(os.path.exists(path) for path in source_paths(chunking_strategy, embedding_model))
+
+    def get_index(self, chunking_strategy: str, embedding_model: str) -> NumpyIndex:
+        key = (chunking_strategy, embedding_model)
+        paths = source_paths(chunking_strategy, embedding_model)
+        if is_projected(embedding_model):
+            paths = paths + [projection_path(embedding_model)]
+        version = tuple(os.path.getmtime(path) for path in paths)
+        with self.lock:
+            if key in self.indexes and self.indexes[key][0] == version:
+                return self.indexes[key][1]
+            loading_lock = self.loading_locks.setdefault(key, threading.Lock())
+        with loading_lock:
+            with self.lock:
+                if key in self.indexes and self.indexes[key][0] == version:
+                    return self.indexes[key][1]
+            metadata, vectors = load_embeddings(chunking_strategy, embedding_model)
+            index = NumpyIndex(metadata, project(vectors, embedding_model))
+            with self.lock:
+                self.indexes[key] = (version, index)
+            return index
+
+    def search(
+            self,
+            chunking_strategy: str,
+            embedding_model: str,
+            query_vector: np.ndarray,
+            min_year: int,
+            max_year: int,
+            genre: str,
+            k: int,
+            min_similarity_score: float) -> list:
+        index = self.get_index(chunking_strategy, embedding_model)
+        return [{
+            'title': index.titles[movie],
+            'year': None if np.isnan(index.years[movie]) else int(index.years[movie]),
+            # same text form as the genre_type[] column read by psycopg2
+            'genres': "{" + ",".join(index.genres[movie]) + "}",
+            'description': index.descriptions[row],
+            'similarity': similarity
+        } for row, movie, similarity in index.search(
+            query_vector, min_year, max_year, genre, k
+        ) if similarity >= min_similarity_score]
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'loaded': [
+                    f"{chunking_strategy}/{embedding_model}"
+                    for chunking_strategy, embedding_model in self.indexes
+                ],
+                'chunks': sum(index.vectors.shape[0] for _, index in self.indexes.values()),
+                'quantization': NUMPY_QUANTIZATION,
+                'memory_mb': round(sum(
+                    index.memory_bytes() for _, index in self.indexes.values()
+                ) / 2**20, 1)
+            }
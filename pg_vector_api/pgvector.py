@@ -1,22 +1,119 @@
-from sentence_transformers import SentenceTransformer
+import os
+import threading
+import time
 
-from db_initialization import init_db
+import numpy as np
+
+from checkpoints import completed_tables, init_checkpoints
+from db_pool import CONNECTION_ERRORS, ConnectionPool
+from embedding_cache import EmbeddingCache
+from hybrid import (HYBRID_DEPTH, best_chunks_statement, description_statement,
+                    reciprocal_rank_fusion, title_statement)
+from indexes import (INDEX_METHOD, ITERATIVE_SCAN_ACTIVE, VECTOR_QUANTIZATION, index_lists,
+                     quantized_distance, set_search_params, short_identifier, vector_dims)
+from model_registry import ModelRegistry
+from numpy_backend import SEARCH_BACKEND, NumpyBackend
+from populate_db import EMBEDDING_MODELS
+from projection import project
+from vector_adapter import register_vector_adapter
+
+register_vector_adapter()
+
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '64'))
+MOVIE_OVERFETCH = int(os.getenv('MOVIE_OVERFETCH', '5'))
+# seconds the set of completed tables is trusted before it is read again
+TABLE_READY_TTL = float(os.getenv('TABLE_READY_TTL', '5'))
+# pgvector caps hnsw.ef_search at 1000
+MAX_CANDIDATES = int(os.getenv('MAX_CANDIDATES', '1000'))
+# filters matching fewer movies than this fraction are searched exactly
+EXACT_SEARCH_SELECTIVITY = float(os.getenv('EXACT_SEARCH_SELECTIVITY', '0.02'))
+MAX_EXACT_CANDIDATES = int(os.getenv('MAX_EXACT_CANDIDATES', '100000'))
+SELECTIVITY_CACHE_SIZE = 1024
+# shortlist size relative to the candidates when the index is quantized,
+# the shortlist is re-ranked by the float32 distance
+RERANK_FACTOR = int(os.getenv('RERANK_FACTOR', '4'))
 
 
 class VectorDB:
     def __init__(self) -> None:
-        self.conn = init_db()
-        self.embedders = {
-            'all-MiniLM-L6-v2': SentenceTransformer('all-MiniLM-L6-v2'),
-            'gtr-t5-base': SentenceTransformer('gtr-t5-base'),
-            'bert-base-nli-mean-tokens': SentenceTransformer('bert-base-nli-mean-tokens')
-        }
+        self.pool = ConnectionPool()
+        self.pool.run(init_checkpoints)
+        self.ready_tables = set()
+        self.ready_checked = 0.0
+        self.selectivity_cache = {}
+        self.selectivity_lock = threading.Lock()
+        self.dims = {}
+        self.lists = {}
+        self.embedders = ModelRegistry(EMBEDDING_MODELS)
+        self.embedding_cache = EmbeddingCache()
+        self.numpy_backend = NumpyBackend() if SEARCH_BACKEND == 'numpy' else None
+
+    @staticmethod
+    def get_chunks_table(chunking_strategy: str) -> str:
+        return f"chunks_{chunking_strategy.lower().replace('-', '_')}"
+
+    @staticmethod
+    def get_table_name(chunking_strategy: str, embedding_model: str) -> str:
+        return f"{chunking_strategy.lower().replace('-', '_')}_{embedding_model.lower().replace('-', '_')}"
+
+    def is_table_ready(self, chunking_strategy: str, embedding_model: str) -> bool:
+        """
+        Completed tables are re-read after TABLE_READY_TTL seconds, so a
+        table the populate job starts reloading stops being searched.
+        """
+        if self.numpy_backend is not None:
+            return self.numpy_backend.is_ready(chunking_strategy, embedding_model)
+        table_name = self.get_table_name(chunking_strategy, embedding_model)
+        if table_name not in self.ready_tables or time.monotonic() - self.ready_checked > TABLE_READY_TTL:
+            try:
+                ready_tables = self.pool.run(completed_tables)
+                for table in self.ready_tables - ready_tables:
+                    # a reloaded table may come back with other dims or lists
+                    self.dims.pop(table, None)
+                    self.lists.pop(table, None)
+                self.ready_tables = ready_tables
+                self.ready_checked = time.monotonic()
+            except Exception as e:
+                print(e)
+        return table_name in self.ready_tables
 
     def get_embedding(self, text: str, embedding_model: str) -> list:
-        embeddings = self.embedders[embedding_model].encode(
-                                                text, convert_to_tensor=False
+        return self.get_embeddings([text], embedding_model)[0].tolist()
+
+    def get_embeddings(self, texts: list, embedding_model: str) -> list:
+        """
+        Embeds all cache misses with a single batched encode call. The
+        cache holds full model embeddings, the active PCA projection of
+        the model is applied on the way out.
+        """
+        embeddings = [self.embedding_cache.get(embedding_model, text) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self.encode([texts[i] for i in missing], embedding_model)
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+        return [project(embedding, embedding_model) for embedding in embeddings]
+
+    def encode(self, texts: list, embedding_model: str) -> list:
+        """
+        Runs the model on the texts, bypassing the cache lookup,
+        and stores the results in the cache.
+        """
+        encoded = self.embedders.get(embedding_model).encode(
+                                                texts,
+                                                batch_size=EMBED_BATCH_SIZE,
+                                                convert_to_tensor=False
                                                 )
-        return embeddings.tolist()
+        for text, embedding in zip(texts, encoded):
+            self.embedding_cache.put(embedding_model, text, embedding)
+        return list(encoded)
+
+    def metrics(self) -> dict:
+        return {
+            'models': self.embedders.stats(),
+            'embedding_cache': self.embedding_cache.stats(),
+            'db_pool': self.pool.stats()
+        } | ({'numpy_backend': self.numpy_backend.stats()} if self.numpy_backend else {})
 
     def search_movies(
             self,
@@ -25,12 +122,151 @@ class VectorDB:
             query: str,
             metadata: dict,
             k: int,
-            min_similarity_score: float) -> list:
-        cur = self.conn.cursor()
+            min_similarity_score: float,
+            ef_search: int = None,
+            probes: int = None,
+            filter_strategy: str = 'auto',
+            search_mode: str = 'vector') -> list:
         query_vector = self.get_embedding(query, embedding_model)
-        query_vector = list(map(str, query_vector))
-        query_vector = f'ARRAY[{",".join(query_vector)}]'
-        table_name = f"{chunking_strategy.lower().replace('-', '_')}_{embedding_model.lower().replace('-', '_')}"
+        return self.search_movies_by_vector(
+            chunking_strategy, embedding_model, query_vector,
+            metadata, k, min_similarity_score, ef_search, probes,
+            filter_strategy, query, search_mode
+        )
+
+    def search_movies_by_vector(
+            self,
+            chunking_strategy: str,
+            embedding_model: str,
+            query_vector: np.ndarray,
+            metadata: dict,
+            k: int,
+            min_similarity_score: float,
+            ef_search: int = None,
+            probes: int = None,
+            filter_strategy: str = 'auto',
+            query: str = '',
+            search_mode: str = 'vector') -> list:
+        """
+        search_mode 'hybrid' needs the query text for the lexical lists and
+        always runs on Postgres, vector searches run in process when
+        SEARCH_BACKEND is 'numpy'.
+        """
+        try:
+            if self.uses_numpy_backend(search_mode):
+                return self.search_numpy(
+                    chunking_strategy, embedding_model, query_vector,
+                    metadata, k, min_similarity_score
+                )
+            return self.pool.run(lambda conn: self.search_by_vector(
+                conn, chunking_strategy, embedding_model, query_vector,
+                metadata, k, min_similarity_score, ef_search, probes,
+                filter_strategy, query, search_mode
+            ))
+        except Exception as e:
+            print(e)
+            return []
+
+    def uses_numpy_backend(self, search_mode: str = 'vector') -> bool:
+        return self.numpy_backend is not None and search_mode != 'hybrid'
+
+    def search_numpy(
+            self,
+            chunking_strategy: str,
+            embedding_model: str,
+            query_vector: np.ndarray,
+            metadata: dict,
+            k: int,
+            min_similarity_score: float) -> list:
+        min_year, max_year, genre = self.parse_filters(metadata)
+        return self.numpy_backend.search(
+            chunking_strategy, embedding_model, query_vector,
+            min_year, max_year, genre, k, min_similarity_score
+        )
+
+    def search_movies_batch(self, searches: list) -> list:
+        """
+        Runs many searches with one batched encode per embedding model and
+        all Postgres lookups in a single transaction on one connection. Every search
+        is a dict with the search_movies arguments, results keep their order.
+        """
+        vectors = [None] * len(searches)
+        by_model = {}
+        for i, search in enumerate(searches):
+            by_model.setdefault(search['embedding_model'], []).append(i)
+        for embedding_model, indices in by_model.items():
+            embeddings = self.get_embeddings(
+                [searches[i]['query'] for i in indices], embedding_model
+            )
+            for i, embedding in zip(indices, embeddings):
+                vectors[i] = embedding
+
+        outputs = [None] * len(searches)
+        db_indices = []
+        for i, search in enumerate(searches):
+            if not self.uses_numpy_backend(search.get('search_mode') or 'vector'):
+                db_indices.append(i)
+                continue
+            try:
+                outputs[i] = self.search_numpy(
+                    search['chunking_strategy'], search['embedding_model'], vectors[i],
+                    search['metadata'], search['k'], search['min_similarity_score']
+                )
+            except Exception as e:
+                print(e)
+                outputs[i] = []
+        if not db_indices:
+            return outputs
+        db_searches = [searches[i] for i in db_indices]
+
+        def run_all(conn) -> list:
+            # statements are prepared up front as preparing commits
+            for search in db_searches:
+                _, _, genre = self.parse_filters(search['metadata'])
+                try:
+                    self.prepare_statements(
+                        conn, search['chunking_strategy'], search['embedding_model'], genre
+                    )
+                    if search.get('search_mode') == 'hybrid':
+                        self.prepare_hybrid_statements(
+                            conn, search['chunking_strategy'], search['embedding_model'],
+                            genre, bool(self.extracted_title(search['metadata']))
+                        )
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception as e:
+                    print(e)
+                    conn.rollback()
+            outputs = []
+            for search, query_vector in zip(db_searches, [vectors[i] for i in db_indices]):
+                try:
+                    outputs.append(self.search_by_vector(
+                        conn, search['chunking_strategy'], search['embedding_model'],
+                        query_vector, search['metadata'], search['k'],
+                        search['min_similarity_score'],
+                        search.get('ef_search'), search.get('probes'),
+                        search.get('filter_strategy') or 'auto',
+                        search['query'], search.get('search_mode') or 'vector'
+                    ))
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception as e:
+                    print(e)
+                    outputs.append([])
+                    conn.rollback()
+            return outputs
+
+        try:
+            db_outputs = self.pool.run(run_all)
+        except Exception as e:
+            print(e)
+            db_outputs = [[] for _ in db_searches]
+        for i, output in zip(db_indices, db_outputs):
+            outputs[i] = output
+        return outputs
+
+    @staticmethod
+    def parse_filters(metadata: dict) -> tuple:
         min_year = str(metadata.get('min_year', '0'))
         if min_year.isnumeric():
             min_year = int(min_year)
@@ -46,35 +282,305 @@ class VectorDB:
             genre = genre[0]
         elif len(str(genre)) == 0:
             genre = None
-        filters = "WHERE 1 = 1"
-        filters += f" AND year >= {min_year}"
-        filters += f" AND year <= {max_year}"
+        return min_year, max_year, genre
+
+    @staticmethod
+    def search_statement(
+            table_name: str,
+            chunks_table: str,
+            genre: str,
+            exact: bool = False,
+            quantization: str = 'none',
+            dims: int = 0) -> tuple:
+        """
+        Name and SQL of the prepared search statement of a table, with
+        parameters (vector, min_year, max_year, n_candidates, k[, genre]).
+        The nearest n_candidates chunks are reduced to the best chunk per
+        movie, so at most k distinct movies are returned and only their
+        winning chunk's text is read.
 
+        The ANN variant orders by the bare distance operator so pgvector
+        serves the candidates from the vector index, filtering on the way.
+        The exact variant orders by an expression the vector index cannot
+        match, so the planner starts from the year/genre indexes on movies
+        and scans only the chunks of matching movies.
+
+        With a halfvec or binary quantized index the ANN variant orders the
+        candidates by the quantized distance, while the best chunk per movie
+        and the result order use the float32 distance, which re-ranks them.
+        """
+        name = f"search_movies_{table_name}"
+        genre_filter = ""
         if genre:
-            filters += f" AND '{genre}' = ANY(genres)"
-        filters += f" AND 1 - (feature_vector::vector <=> {query_vector}::vector) >= {min_similarity_score}"
+            name += "_genre"
+            genre_filter = "AND m.genres @> ARRAY[$6::genre_type]"
+        order_by = "e.feature_vector <=> $1::vector"
+        if exact:
+            name += "_exact"
+            order_by = f"({order_by}) + 0"
+        elif quantization != 'none':
+            name += f"_{quantization}"
+            order_by = quantized_distance(quantization, dims, "e.feature_vector", "$1::vector")
+        name = short_identifier(name)
+        sql = f"""
+        SELECT best.chunk_id, m.title, m.year, m.genres, c.description, best.distance,
+               best.n_candidates, best.max_distance, best.movie_id
+        FROM (
+            SELECT chunk_id, movie_id, distance,
+                   count(*) OVER () AS n_candidates,
+                   max(distance) OVER () AS max_distance,
+                   row_number() OVER (PARTITION BY movie_id ORDER BY distance) AS movie_rank
+            FROM (
+                SELECT e.chunk_id, e.movie_id, e.feature_vector <=> $1::vector AS distance
+                FROM {table_name} e
+                JOIN movies m ON m.id = e.movie_id
+                WHERE m.year >= $2 AND m.year <= $3 {genre_filter}
+                ORDER BY {order_by}
+                LIMIT $4
+            ) candidates
+        ) best
+        JOIN {chunks_table} c ON c.id = best.chunk_id
+        JOIN movies m ON m.id = best.movie_id
+        WHERE best.movie_rank = 1
+        ORDER BY best.distance
+        LIMIT $5;
+        """
+        return name, sql
 
-        sql_query = f"""
-        SELECT id, title, year, genres, description, 1 - (feature_vector::vector <=> {query_vector}::vector) AS similarity
-        FROM {table_name}
-        {filters}
-        ORDER BY similarity DESC
-        LIMIT {k*5};
+    def prepare_statements(
+            self,
+            conn,
+            chunking_strategy: str,
+            embedding_model: str,
+            genre: str) -> dict:
+        table_name = self.get_table_name(chunking_strategy, embedding_model)
+        chunks_table = self.get_chunks_table(chunking_strategy)
+        if table_name not in self.dims:
+            self.dims[table_name] = vector_dims(conn, table_name)
+        names = {}
+        for exact in [False, True]:
+            name, sql = self.search_statement(
+                table_name, chunks_table, genre, exact,
+                VECTOR_QUANTIZATION, self.dims[table_name]
+            )
+            self.pool.prepare(conn, name, sql)
+            names[exact] = name
+        return names
+
+    def index_lists(self, conn, table_name: str) -> int:
         """
-        try:
-            cur.execute(sql_query)
-            results = cur.fetchall()
-        except Exception as e:
-            print(e)
-            self.conn = init_db()
-            results = []
-        output = [{
+        Lists of the table's IVFFlat index, cached per table, 0 for HNSW.
+        """
+        if INDEX_METHOD != 'ivfflat':
+            return 0
+        if table_name not in self.lists:
+            self.lists[table_name] = index_lists(conn, table_name)
+        return self.lists[table_name]
+
+    def estimate_selectivity(self, conn, min_year: int, max_year: int, genre: str) -> float:
+        """
+        Planner estimate of the fraction of movies passing the filters,
+        cached per filter combination.
+        """
+        key = (min_year, max_year, genre)
+        with self.selectivity_lock:
+            if key in self.selectivity_cache:
+                return self.selectivity_cache[key]
+        cur = conn.cursor()
+        sql = "SELECT 1 FROM movies m WHERE m.year >= %s AND m.year <= %s"
+        params = [min_year, max_year]
+        if genre:
+            sql += " AND m.genres @> ARRAY[%s::genre_type]"
+            params.append(genre)
+        cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        matching = cur.fetchone()[0][0]['Plan']['Plan Rows']
+        cur.execute("SELECT reltuples FROM pg_class WHERE relname = 'movies';")
+        total = cur.fetchone()[0]
+        cur.close()
+        selectivity = min(matching / total, 1.0) if total > 0 else 1.0
+        with self.selectivity_lock:
+            if len(self.selectivity_cache) >= SELECTIVITY_CACHE_SIZE:
+                self.selectivity_cache.pop(next(iter(self.selectivity_cache)))
+            self.selectivity_cache[key] = selectivity
+        return selectivity
+
+    def search_by_vector(
+            self,
+            conn,
+            chunking_strategy: str,
+            embedding_model: str,
+            query_vector: np.ndarray,
+            metadata: dict,
+            k: int,
+            min_similarity_score: float,
+            ef_search: int = None,
+            probes: int = None,
+            filter_strategy: str = 'auto',
+            query: str = '',
+            search_mode: str = 'vector') -> list:
+        """
+        Top-k distinct movies. search_mode 'vector' ranks movies by their
+        closest chunk, 'hybrid' fuses that ranking with full-text/trigram
+        rankings over titles and descriptions.
+        """
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        if search_mode == 'hybrid' and query:
+            results = self.hybrid_rows(
+                conn, chunking_strategy, embedding_model, query_vector,
+                query, metadata, k, min_similarity_score, ef_search, probes,
+                filter_strategy
+            )
+        else:
+            results = self.vector_rows(
+                conn, chunking_strategy, embedding_model, query_vector,
+                metadata, k, min_similarity_score, ef_search, probes,
+                filter_strategy
+            )
+        # the similarity threshold is applied on the returned movies
+        return [{
             'title': row[1],
             'year': row[2],
             'genres': row[3],
             'description': row[4],
-            'similarity': row[5]
-        } for row in results]
+            'similarity': 1 - row[5]
+        } for row in results if 1 - row[5] >= min_similarity_score]
+
+    def vector_rows(
+            self,
+            conn,
+            chunking_strategy: str,
+            embedding_model: str,
+            query_vector: np.ndarray,
+            metadata: dict,
+            k: int,
+            min_similarity_score: float,
+            ef_search: int = None,
+            probes: int = None,
+            filter_strategy: str = 'auto') -> list:
+        """
+        filter_strategy 'exact' scans only the movies passing the filters,
+        'ann' uses the vector index and over-fetches by the inverse of the
+        filter selectivity, 'auto' picks 'exact' when the estimated
+        selectivity is below EXACT_SEARCH_SELECTIVITY. The candidate set is
+        doubled while fewer than k movies were found and more candidates
+        above the similarity threshold may exist. Fewer candidates than
+        asked for only means none are left when the scan is exact or the
+        index scan is iterative; a plain index scan stops at ef_search or
+        the probed lists and drops what the filters reject, so a short or
+        empty result widens up to the cap.
+        """
+        min_year, max_year, genre = self.parse_filters(metadata)
+        selectivity = self.estimate_selectivity(conn, min_year, max_year, genre)
+        names = self.prepare_statements(conn, chunking_strategy, embedding_model, genre)
+        if filter_strategy == 'auto':
+            filter_strategy = 'exact' if selectivity < EXACT_SEARCH_SELECTIVITY else 'ann'
+        exact = filter_strategy == 'exact'
+        name = names[exact]
+        lists = self.index_lists(conn, self.get_table_name(chunking_strategy, embedding_model))
+
+        n_candidates = k*MOVIE_OVERFETCH
+        max_candidates = MAX_EXACT_CANDIDATES if exact else MAX_CANDIDATES
+        if not exact:
+            n_candidates = int(n_candidates / max(selectivity, 1e-3))
+            if VECTOR_QUANTIZATION != 'none':
+                n_candidates *= RERANK_FACTOR
+        n_candidates = min(n_candidates, max_candidates)
+
+        # a short result means no more candidates only for these scans
+        complete = exact or ITERATIVE_SCAN_ACTIVE
+        cur = conn.cursor()
+        while True:
+            params = [query_vector, min_year, max_year, n_candidates, k]
+            if genre:
+                params.append(genre)
+            set_search_params(cur, ef_search, probes, min(n_candidates, MAX_CANDIDATES), lists)
+            cur.execute(
+                f"EXECUTE {name} ({', '.join(['%s'] * len(params))});", params
+            )
+            results = cur.fetchall()
+            if len(results) >= k or n_candidates >= max_candidates:
+                break
+            if results and 1 - results[0][7] < min_similarity_score:
+                break
+            # an ANN shortlist the filters emptied says nothing about the rest
+            if complete and (not results or results[0][6] < n_candidates):
+                break
+            n_candidates = min(n_candidates*2, max_candidates)
         cur.close()
+        return results
+
+    @staticmethod
+    def extracted_title(metadata: dict) -> str:
+        title = metadata.get('title', '')
+        if isinstance(title, list):
+            title = title[0] if len(title) > 0 else ''
+        return str(title or '').strip()
+
+    def prepare_hybrid_statements(
+            self,
+            conn,
+            chunking_strategy: str,
+            embedding_model: str,
+            genre: str,
+            trigram: bool) -> list:
+        table_name = self.get_table_name(chunking_strategy, embedding_model)
+        chunks_table = self.get_chunks_table(chunking_strategy)
+        names = []
+        for name, sql in [
+                title_statement(genre, trigram),
+                description_statement(chunks_table, genre),
+                best_chunks_statement(table_name, chunks_table)]:
+            self.pool.prepare(conn, name, sql)
+            names.append(name)
+        return names
+
+    def hybrid_rows(
+            self,
+            conn,
+            chunking_strategy: str,
+            embedding_model: str,
+            query_vector: np.ndarray,
+            query: str,
+            metadata: dict,
+            k: int,
+            min_similarity_score: float,
+            ef_search: int = None,
+            probes: int = None,
+            filter_strategy: str = 'auto') -> list:
+        """
+        Reciprocal-rank fusion of the vector ranking with the title and
+        description rankings, each HYBRID_DEPTH movies deep. The title is
+        matched by trigram similarity against the extracted title when the
+        metadata has one, by full-text search on the query otherwise.
+        Every fused movie is returned with its closest chunk.
+        """
+        min_year, max_year, genre = self.parse_filters(metadata)
+        title = self.extracted_title(metadata)
+        title_name, description_name, best_name = self.prepare_hybrid_statements(
+            conn, chunking_strategy, embedding_model, genre, bool(title)
+        )
+        depth = max(HYBRID_DEPTH, k)
+        vector_results = self.vector_rows(
+            conn, chunking_strategy, embedding_model, query_vector,
+            metadata, depth, min_similarity_score, ef_search, probes,
+            filter_strategy
+        )
+        rankings = [[row[8] for row in vector_results]]
 
-        return output
+        cur = conn.cursor()
+        for name, text in [(title_name, title or query), (description_name, query)]:
+            params = [text, min_year, max_year, depth]
+            if genre:
+                params.append(genre)
+            cur.execute(
+                f"EXECUTE {name} ({', '.join(['%s'] * len(params))});", params
+            )
+            rankings.append([row[0] for row in cur.fetchall()])
+        movie_ids = reciprocal_rank_fusion(rankings, k)
+        if not movie_ids:
+            cur.close()
+            return []
+        cur.execute(f"EXECUTE {best_name} (%s, %s);", [query_vector, movie_ids])
+        rows = {row[8]: row for row in cur.fetchall()}
+        cur.close()
+        return [rows[movie_id] for movie_id in movie_ids if movie_id in rows]
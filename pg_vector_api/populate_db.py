@@ -1,13 +1,33 @@
-import ast
+import argparse
+import csv
+import hashlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
+import numpy as np
 import pandas as pd
-import psycopg2
 from dotenv import load_dotenv
 from tqdm import tqdm
 from db_initialization import init_db
+from checkpoints import (MOVIE_HASHES_TABLE, get_checkpoint, get_movie_hashes,
+                         init_checkpoints, mark_incomplete, save_checkpoint, save_movie_hashes)
+from embedding_store import content_hash, load_embeddings
+from indexes import (create_filter_indexes, create_movie_indexes,
+                     create_text_indexes, create_vector_index,
+                     drop_vector_index, reset_vector_dims, vector_dims)
+from projection import project, projection_hash
+from vector_adapter import format_vector
 
 load_dotenv()
 
+COPY_BATCH_SIZE = int(os.getenv('COPY_BATCH_SIZE', '10000'))
+POPULATE_WORKERS = int(os.getenv('POPULATE_WORKERS', '3'))
+# syncs loading more than this fraction of a table rebuild its vector index
+INCREMENTAL_REINDEX_FRACTION = float(os.getenv('INCREMENTAL_REINDEX_FRACTION', '0.2'))
+
 
 CHUNKING_STRATEGIES = [
     'fixed-size-splitter',
@@ -21,45 +41,188 @@ EMBEDDING_MODELS = [
 ]
 
 
-def load_data(chunking_strategy: str, embedding_model: str) -> pd.DataFrame:
-    path = f"embeddings/{chunking_strategy}/{embedding_model}/embeddings.csv"
-    embeddings_df = pd.read_csv(path)
-    embeddings_df['genres'] = embeddings_df['genres'].apply(
-                                                        ast.literal_eval
-                                                        )
-    embeddings_df['embedding'] = embeddings_df['embedding'].apply(
-                                                        ast.literal_eval
-                                                        )
-    return embeddings_df
+def load_data(chunking_strategy: str, embedding_model: str) -> tuple:
+    df, vectors = load_embeddings(chunking_strategy, embedding_model)
+    return df, project(vectors, embedding_model)
 
 
-def insert_row(
-        conn,
-        table_name: str,
-        title: str,
-        year: int,
-        genres: list,
-        description: str,
-        vector: list):
-    genres = "{" + ",".join(genres) + "}"
-    query = f"""
-INSERT INTO {table_name}
-(title, year, genres, description, feature_vector) VALUES (%s, %s, %s, %s, %s);
-            """
+def source_hash(chunking_strategy: str, embedding_model: str) -> str:
+    """
+    Hash of the embedding files and of the active projection, so a table is
+    reloaded when either changes.
+    """
+    digest = content_hash(chunking_strategy, embedding_model)
+    projection = projection_hash(embedding_model)
+    if projection:
+        digest = hashlib.sha256((digest + projection).encode()).hexdigest()
+    return digest
+
+
+def format_genres(genres: list) -> str:
+    return "{" + ",".join(genres) + "}"
+
+
+def format_vectors(vectors: np.ndarray) -> list:
+    return [format_vector(row) for row in vectors]
+
+
+def get_chunks_table(chunking_strategy: str) -> str:
+    return f"chunks_{chunking_strategy.lower().replace('-', '_')}"
+
+
+def copy_rows(cur, table_name: str, chunks_table: str, rows):
+    """
+    COPYs the rows into a per-session staging table, then upserts the
+    movies and chunk texts they reference and inserts the vectors. Rows
+    are ordered by key so concurrent loaders lock movies in the same order.
+    """
+    cur.execute("""
+    CREATE TEMP TABLE IF NOT EXISTS staging_rows (
+        title TEXT,
+        year INTEGER,
+        genres genre_type ARRAY,
+        description TEXT,
+        feature_vector VECTOR
+    ) ON COMMIT DELETE ROWS;
+    """)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cur.copy_expert(
+        """
+COPY staging_rows (title, year, genres, description, feature_vector)
+FROM STDIN WITH (FORMAT csv);
+        """,
+        buffer
+    )
+    cur.execute("""
+    INSERT INTO movies (title, year, genres)
+    SELECT DISTINCT ON (title, year) title, year, genres
+    FROM staging_rows
+    ORDER BY title, year
+    ON CONFLICT (title, year) DO UPDATE SET genres = EXCLUDED.genres
+    WHERE movies.genres IS DISTINCT FROM EXCLUDED.genres;
+    """)
+    cur.execute(f"""
+    INSERT INTO {chunks_table} (movie_id, text_hash, description)
+    SELECT DISTINCT ON (m.id, md5(s.description)) m.id, md5(s.description), s.description
+    FROM staging_rows s
+    JOIN movies m ON m.title = s.title AND m.year = s.year
+    ORDER BY m.id, md5(s.description)
+    ON CONFLICT (movie_id, text_hash) DO NOTHING;
+    """)
+    cur.execute(f"""
+    INSERT INTO {table_name} (chunk_id, movie_id, feature_vector)
+    SELECT c.id, c.movie_id, s.feature_vector
+    FROM staging_rows s
+    JOIN movies m ON m.title = s.title AND m.year = s.year
+    JOIN {chunks_table} c ON c.movie_id = m.id AND c.text_hash = md5(s.description)
+    ON CONFLICT (chunk_id) DO NOTHING;
+    """)
+
+
+def movie_hashes(df: pd.DataFrame, salt: str = '') -> dict:
+    """
+    (title, year) -> sha256 over the genres and chunk texts of the movie,
+    salted with the projection hash so re-projected vectors count as changed.
+    """
+    digests = {}
+    for title, year, genres, description in zip(
+            df['title'], df['year'], df['genres'], df['description']):
+        key = (title, int(year))
+        if key not in digests:
+            digests[key] = hashlib.sha256(salt.encode())
+            digests[key].update(",".join(genres).encode())
+        digests[key].update(b"\x1f" + str(description).encode())
+    return {key: digest.hexdigest() for key, digest in digests.items()}
+
+
+def diff_movies(stored: dict, loaded: dict) -> dict:
+    """
+    Compares the movie hashes of the embedding store with the ones loaded
+    into a table.
+    """
+    return {
+        'added': [key for key in stored if key not in loaded],
+        'changed': [key for key in stored if key in loaded and loaded[key] != stored[key]],
+        'removed': [key for key in loaded if key not in stored],
+        'unchanged': [key for key in stored if loaded.get(key) == stored[key]]
+    }
+
+
+def delete_movies(conn, table_name: str, movies: list):
+    """
+    Deletes the vectors and movie hashes of the given (title, year) movies
+    from one table. Chunks and movies left without vectors are pruned by
+    prune_orphans once every table is synced.
+    """
+    if not movies:
+        return
     cur = conn.cursor()
-    cur.execute(query, (title, year, genres, description, vector))
+    cur.execute(f"""
+    WITH targets AS (
+        SELECT m.id FROM movies m
+        JOIN unnest(%s::text[], %s::integer[]) AS v(title, year)
+        ON m.title = v.title AND m.year = v.year
+    ), deleted AS (
+        DELETE FROM {table_name} e USING targets t WHERE e.movie_id = t.id
+    )
+    DELETE FROM {MOVIE_HASHES_TABLE} h USING targets t
+    WHERE h.table_name = %s AND h.movie_id = t.id;
+    """, ([title for title, _ in movies], [year for _, year in movies], table_name))
     conn.commit()
     cur.close()
 
 
-def populate_df(conn, table_name: str, df: pd.DataFrame):
-    for i, (_, row) in zip(tqdm(range(len(df))), df.iterrows()):
-        title = row['title']
-        year = row['year']
-        genres = row['genres']
-        description = row['description']
-        vector = row['embedding']
-        insert_row(conn, table_name, title, year, genres, description, vector)
+def populate_df(
+        conn,
+        table_name: str,
+        chunks_table: str,
+        df: pd.DataFrame,
+        vectors: np.ndarray,
+        rows: np.ndarray,
+        hashes: dict,
+        source_hash: str) -> float:
+    """
+    Streams the given rows of the dataframe into the normalized tables with
+    COPY. Rows are grouped by movie and batches of about COPY_BATCH_SIZE
+    rows end on a movie boundary, so every batch is committed together with
+    the hashes of the movies it completes and an interrupted load picks up
+    at the first movie without a hash. Returns the load throughput in rows/sec.
+    """
+    keys = list(zip(df['title'].to_numpy()[rows], df['year'].to_numpy()[rows]))
+    codes, _ = pd.factorize(pd.Series(keys, dtype=object))
+    order = np.argsort(codes, kind='stable')
+    rows, codes = rows[order], codes[order]
+    movie_starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+    start = time.perf_counter()
+    cur = conn.cursor()
+    begin = 0
+    with tqdm(total=len(rows), desc=table_name) as progress:
+        while begin < len(rows):
+            i = np.searchsorted(movie_starts, begin + COPY_BATCH_SIZE)
+            end = movie_starts[i] if i < len(movie_starts) else len(rows)
+            batch_rows = rows[begin:end]
+            batch = df.iloc[batch_rows]
+            copy_rows(cur, table_name, chunks_table, zip(
+                batch['title'],
+                batch['year'],
+                batch['genres'].map(format_genres),
+                batch['description'],
+                format_vectors(vectors[batch_rows])
+            ))
+            batch_keys = {(title, int(year)) for title, year in zip(batch['title'], batch['year'])}
+            save_movie_hashes(cur, table_name, {key: hashes[key] for key in batch_keys})
+            save_checkpoint(cur, table_name, source_hash, end, len(rows))
+            conn.commit()
+            progress.update(end - begin)
+            begin = end
+    cur.close()
+    elapsed = time.perf_counter() - start
+    rows_per_sec = len(rows) / max(elapsed, 1e-9)
+    print(f"{table_name}: {len(rows)} rows in {elapsed:.1f}s ({rows_per_sec:.0f} rows/sec)")
+    return rows_per_sec
 
 
 def delete_content(conn, table_name: str):
@@ -79,18 +242,165 @@ def count_rows(conn, table_name: str) -> int:
     return row_count
 
 
-def populate_all():
+def get_table_name(chunking_strategy: str, embedding_model: str) -> str:
+    return f"{chunking_strategy.lower().replace('-', '_')}_{embedding_model.lower().replace('-', '_')}"
+
+
+def sync_table(
+        conn,
+        table_name: str,
+        chunks_table: str,
+        df: pd.DataFrame,
+        vectors: np.ndarray,
+        source_hash: str,
+        salt: str = '') -> dict:
+    """
+    Brings the table in line with the embedding store movie by movie:
+    removed and changed movies are deleted, new and changed ones are
+    loaded, unchanged ones are not touched. The vector index is only
+    dropped when more than INCREMENTAL_REINDEX_FRACTION of the rows are
+    loaded, smaller loads are inserted into the live index. A table with
+    anything to delete or load is not searchable until populate_table
+    completes it again. Returns the diff summary.
+    """
+    hashes = movie_hashes(df, salt)
+    diff = diff_movies(hashes, get_movie_hashes(conn, table_name))
+    to_load = set(diff['added']) | set(diff['changed'])
+    if to_load or diff['removed']:
+        mark_incomplete(conn, table_name)
+    delete_movies(conn, table_name, diff['removed'] + diff['changed'])
+
+    rows = np.flatnonzero([
+        (title, int(year)) in to_load for title, year in zip(df['title'], df['year'])
+    ])
+    if len(rows) > INCREMENTAL_REINDEX_FRACTION * len(df):
+        drop_vector_index(conn, table_name)
+    if len(rows) > 0:
+        populate_df(
+            conn, table_name, chunks_table, df, vectors, rows,
+            hashes, source_hash
+        )
+    summary = {name: len(movies) for name, movies in diff.items()}
+    summary['loaded_rows'] = len(rows)
+    print(
+        f"{table_name}: +{summary['added']} added ~{summary['changed']} changed "
+        f"-{summary['removed']} removed ={summary['unchanged']} unchanged movies, "
+        f"{summary['loaded_rows']} rows loaded"
+    )
+    return summary
+
+
+def populate_table(chunking_strategy: str, embedding_model: str) -> tuple:
+    """
+    Syncs one table with its embedding store and (re)builds its indexes.
+    Returns the table name and the diff summary of the run.
+    """
     conn = init_db()
+    table_name = get_table_name(chunking_strategy, embedding_model)
+    table_hash = source_hash(chunking_strategy, embedding_model)
+    embeddings_df, vectors = load_data(chunking_strategy, embedding_model)
+    if vector_dims(conn, table_name) != vectors.shape[1]:
+        # a projection was switched on or off, the column is retyped empty
+        mark_incomplete(conn, table_name)
+        reset_vector_dims(conn, table_name, vectors.shape[1])
+
+    checkpoint = get_checkpoint(conn, table_name)
+    if checkpoint is not None and checkpoint['completed'] and checkpoint['content_hash'] == table_hash:
+        summary = {'unchanged': embeddings_df[['title', 'year']].drop_duplicates().shape[0]}
+        print(f"{table_name}: store unchanged")
+    else:
+        summary = sync_table(
+            conn, table_name, get_chunks_table(chunking_strategy),
+            embeddings_df, vectors, table_hash, projection_hash(embedding_model)
+        )
+
+    start = time.perf_counter()
+    create_vector_index(conn, table_name)
+    create_filter_indexes(conn, table_name)
+    print(f"{table_name}: index ready in {time.perf_counter() - start:.1f}s")
+
+    cur = conn.cursor()
+    save_checkpoint(
+        cur, table_name, table_hash,
+        len(embeddings_df), len(embeddings_df), completed=True
+    )
+    conn.commit()
+    cur.close()
+    conn.close()
+    return table_name, summary
+
 
+def prune_orphans(conn):
+    """
+    Deletes chunks no model table of their strategy references any more
+    and movies without chunks.
+    """
+    cur = conn.cursor()
     for chunking_strategy in CHUNKING_STRATEGIES:
-        for embedding_model in EMBEDDING_MODELS:
-            embeddings_df = load_data(chunking_strategy, embedding_model)
-            table_name = f"{chunking_strategy.lower().replace('-', '_')}_{embedding_model.lower().replace('-', '_')}"
-            n = count_rows(conn, table_name)
-            if n < 10:
-                delete_content(conn, table_name)
-                populate_df(conn, table_name, embeddings_df)
+        chunks_table = get_chunks_table(chunking_strategy)
+        referenced = " AND ".join(
+            f"NOT EXISTS (SELECT 1 FROM {get_table_name(chunking_strategy, embedding_model)} e "
+            f"WHERE e.chunk_id = c.id)"
+            for embedding_model in EMBEDDING_MODELS
+        )
+        cur.execute(f"DELETE FROM {chunks_table} c WHERE {referenced};")
+        print(f"{chunks_table}: {cur.rowcount} orphaned chunks pruned")
+    has_chunks = " AND ".join(
+        f"NOT EXISTS (SELECT 1 FROM {get_chunks_table(chunking_strategy)} c WHERE c.movie_id = m.id)"
+        for chunking_strategy in CHUNKING_STRATEGIES
+    )
+    cur.execute(f"DELETE FROM movies m WHERE {has_chunks};")
+    print(f"movies: {cur.rowcount} orphaned movies pruned")
+    conn.commit()
+    cur.close()
+
+
+def populate_all(workers: int = POPULATE_WORKERS) -> list:
+    """
+    Syncs every strategy/model table in its own worker process with its
+    own connection. A table is marked completed, and becomes searchable,
+    as soon as its rows and index are in place. Orphaned chunks and movies
+    are pruned once all workers are done. Returns the failed tables.
+    """
+    conn = init_db()
+    init_checkpoints(conn)
+    create_movie_indexes(conn)
+    create_text_indexes(conn, [
+        get_chunks_table(chunking_strategy) for chunking_strategy in CHUNKING_STRATEGIES
+    ])
+    conn.close()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(populate_table, chunking_strategy, embedding_model):
+            get_table_name(chunking_strategy, embedding_model)
+            for chunking_strategy in CHUNKING_STRATEGIES
+            for embedding_model in EMBEDDING_MODELS
+        }
+        failed = []
+        totals = {}
+        for future in as_completed(futures):
+            try:
+                table_name, summary = future.result()
+                print(f"{table_name}: completed")
+                for name, count in summary.items():
+                    totals[name] = totals.get(name, 0) + count
+            except Exception as e:
+                print(f"{futures[future]}: failed with {e}")
+                failed.append(futures[future])
+
+    conn = init_db()
+    prune_orphans(conn)
+    conn.close()
+    print("diff summary over all tables: " + ", ".join(
+        f"{name}={count}" for name, count in totals.items()
+    ))
+    return failed
 
 
 if __name__ == '__main__':
-    populate_all()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, default=POPULATE_WORKERS)
+    args = parser.parse_args()
+    if populate_all(args.workers):
+        sys.exit(1)
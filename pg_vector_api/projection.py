@@ -0,0 +1,128 @@
+"""
+PCA projection of the 768-dim embedding models. None of the served models
+is trained for Matryoshka truncation, so the reduced basis is fitted on
+the stored chunk embeddings of every chunking strategy and saved as
+
+    embeddings/projections/<model>_pca<dims>.npz   mean, components
+
+With PROJECTION_DIMS set, populate_db loads projected vectors into
+VECTOR(<dims>) columns and VectorDB projects query embeddings the same way.
+
+python projection.py --dims 256 [--models gtr-t5-base bert-base-nli-mean-tokens]
+"""
+import argparse
+import functools
+import hashlib
+import os
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embedding_store import EMBEDDINGS_DIR, load_embeddings
+
+load_dotenv()
+
+# 0 keeps the full model dimension
+PROJECTION_DIMS = int(os.getenv('PROJECTION_DIMS', '0'))
+PROJECTION_MODELS = [
+    name.strip() for name in os.getenv(
+        'PROJECTION_MODELS', 'gtr-t5-base,bert-base-nli-mean-tokens'
+    ).split(',') if name.strip()
+]
+PCA_SAMPLE_ROWS = int(os.getenv('PCA_SAMPLE_ROWS', '50000'))
+PROJECT_BLOCK_ROWS = 65536
+
+
+def projection_path(embedding_model: str, dims: int = PROJECTION_DIMS) -> str:
+    return os.path.join(EMBEDDINGS_DIR, 'projections', f"{embedding_model}_pca{dims}.npz")
+
+
+def is_projected(embedding_model: str, dims: int = PROJECTION_DIMS) -> bool:
+    return dims > 0 and embedding_model in PROJECTION_MODELS and \
+        os.path.exists(projection_path(embedding_model, dims))
+
+
+@functools.lru_cache(maxsize=None)
+def load_projection(embedding_model: str, dims: int = PROJECTION_DIMS) -> tuple:
+    """
+    (mean, components) of the projection, components has shape (dims, model_dims).
+    """
+    data = np.load(projection_path(embedding_model, dims))
+    return data['mean'].astype(np.float32), data['components'].astype(np.float32)
+
+
+def project(vectors: np.ndarray, embedding_model: str, dims: int = PROJECTION_DIMS) -> np.ndarray:
+    """
+    Projects a vector or a matrix of row vectors, blocks keep the float32
+    working set of large memory-mapped matrices bounded. Vectors of models
+    without an active projection are returned unchanged.
+    """
+    if not is_projected(embedding_model, dims):
+        return vectors
+    mean, components = load_projection(embedding_model, dims)
+    if np.ndim(vectors) == 1:
+        return (np.asarray(vectors, dtype=np.float32) - mean) @ components.T
+    projected = np.empty((len(vectors), dims), dtype=np.float32)
+    for start in range(0, len(vectors), PROJECT_BLOCK_ROWS):
+        rows = slice(start, start + PROJECT_BLOCK_ROWS)
+        projected[rows] = (np.asarray(vectors[rows], dtype=np.float32) - mean) @ components.T
+    return projected
+
+
+def projection_hash(embedding_model: str, dims: int = PROJECTION_DIMS) -> str:
+    """
+    sha256 of the active projection file, empty without one.
+    """
+    if not is_projected(embedding_model, dims):
+        return ''
+    with open(projection_path(embedding_model, dims), 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def fit_projection(
+        embedding_model: str,
+        chunking_strategies: list,
+        dims: int,
+        sample_rows: int = PCA_SAMPLE_ROWS) -> np.ndarray:
+    """
+    Fits PCA on a sample of the chunk embeddings of all strategies, saves
+    it and returns the explained variance ratio of the kept components.
+    """
+    rng = np.random.default_rng(0)
+    matrices = [load_embeddings(chunking_strategy, embedding_model)[1]
+                for chunking_strategy in chunking_strategies]
+    total = sum(len(matrix) for matrix in matrices)
+    samples = []
+    for matrix in matrices:
+        n_sample = min(len(matrix), max(1, sample_rows * len(matrix) // total))
+        rows = np.sort(rng.choice(len(matrix), n_sample, replace=False))
+        samples.append(np.asarray(matrix[rows], dtype=np.float32))
+    sample = np.concatenate(samples)
+    mean = sample.mean(axis=0)
+    _, singular_values, components = np.linalg.svd(sample - mean, full_matrices=False)
+    variance = singular_values ** 2
+    os.makedirs(os.path.dirname(projection_path(embedding_model, dims)), exist_ok=True)
+    np.savez(
+        projection_path(embedding_model, dims),
+        mean=mean.astype(np.float32),
+        components=components[:dims].astype(np.float32)
+    )
+    return variance[:dims] / variance.sum()
+
+
+def main():
+    from populate_db import CHUNKING_STRATEGIES
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dims', type=int, default=PROJECTION_DIMS or 256)
+    parser.add_argument('--models', nargs='+', default=PROJECTION_MODELS)
+    parser.add_argument('--sample-rows', type=int, default=PCA_SAMPLE_ROWS)
+    args = parser.parse_args()
+
+    for embedding_model in args.models:
+        explained = fit_projection(embedding_model, CHUNKING_STRATEGIES, args.dims, args.sample_rows)
+        print(f"{embedding_model}: {args.dims} components explain {explained.sum():.3f} of the variance")
+
+
+if __name__ == '__main__':
+    main()
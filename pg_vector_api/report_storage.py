@@ -0,0 +1,47 @@
+"""
+On-disk size and buffer cache hit ratio of the movie search tables. Run it
+against a database loaded with the old per-chunk layout and the normalized
+one to compare both.
+
+python report_storage.py
+"""
+from db_initialization import init_db
+
+
+def main():
+    conn = init_db()
+    cur = conn.cursor()
+    cur.execute("""
+    SELECT s.relname,
+           pg_total_relation_size(s.relid) AS total_bytes,
+           pg_relation_size(s.relid) AS heap_bytes,
+           pg_indexes_size(s.relid) AS index_bytes,
+           coalesce(s.heap_blks_hit, 0) + coalesce(s.toast_blks_hit, 0) AS heap_hit,
+           coalesce(s.heap_blks_read, 0) + coalesce(s.toast_blks_read, 0) AS heap_read,
+           coalesce(s.idx_blks_hit, 0) AS idx_hit,
+           coalesce(s.idx_blks_read, 0) AS idx_read
+    FROM pg_statio_user_tables s
+    WHERE s.relname <> 'population_checkpoints'
+    ORDER BY s.relname;
+    """)
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+
+    total, hits, reads = 0, 0, 0
+    for name, total_bytes, heap_bytes, index_bytes, heap_hit, heap_read, idx_hit, idx_read in rows:
+        blocks = heap_hit + heap_read + idx_hit + idx_read
+        ratio = (heap_hit + idx_hit) / blocks if blocks else 0.0
+        print(
+            f"{name}: total={total_bytes / 2**20:.1f}MB heap={heap_bytes / 2**20:.1f}MB "
+            f"indexes={index_bytes / 2**20:.1f}MB cache_hit_ratio={ratio:.3f}"
+        )
+        total += total_bytes
+        hits += heap_hit + idx_hit
+        reads += heap_read + idx_read
+    ratio = hits / (hits + reads) if hits + reads else 0.0
+    print(f"all tables: total={total / 2**30:.2f}GB cache_hit_ratio={ratio:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import gc
+
+import db_pool
+from db_pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn) -> None:
+        self.conn = conn
+        self.row = None
+
+    def execute(self, sql: str, params=None):
+        if 'pg_prepared_statements' in sql:
+            self.row = (1,) if params[0] in self.conn.statements else None
+        elif sql.startswith('PREPARE '):
+            self.conn.statements.add(sql.split()[1])
+        elif sql.startswith('EXECUTE '):
+            name = sql.split()[1].rstrip(';')
+            if name not in self.conn.statements:
+                raise RuntimeError(f"prepared statement \"{name}\" does not exist")
+
+    def fetchone(self):
+        return self.row
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """
+    Session with its own prepared statements, like a server connection.
+    """
+    def __init__(self) -> None:
+        self.closed = 0
+        self.statements = set()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeThreadedConnectionPool:
+    """
+    Keeps at most minconn idle connections and closes the ones returned
+    past that, like psycopg2's ThreadedConnectionPool.
+    """
+    def __init__(self, minconn: int, maxconn: int, **kwargs) -> None:
+        self.minconn = minconn
+        self.idle = [FakeConnection() for _ in range(minconn)]
+
+    def getconn(self):
+        return self.idle.pop() if self.idle else FakeConnection()
+
+    def putconn(self, conn, close: bool = False):
+        if close or len(self.idle) >= self.minconn:
+            conn.close()
+        else:
+            self.idle.append(conn)
+
+
+def test_statements_are_not_inherited_past_minconn(monkeypatch):
+    monkeypatch.setattr(db_pool, 'ThreadedConnectionPool', FakeThreadedConnectionPool)
+    pool = ConnectionPool(minconn=2, maxconn=6)
+
+    for _ in range(20):
+        # more connections than minconn, the extra ones are closed on release
+        with pool.connection() as a, pool.connection() as b, pool.connection() as c, \
+                pool.connection() as d:
+            for conn in (a, b, c, d):
+                pool.prepare(conn, 'search', 'SELECT 1')
+                conn.cursor().execute('EXECUTE search;')
+        gc.collect()
+
+    assert len(pool.prepared) <= 2
+    assert len(pool.last_used) <= 2
+    with pool.connection() as conn:
+        assert pool.prepared.get(conn, set()) <= conn.statements
@@ -0,0 +1,73 @@
+import numpy as np
+
+import pgvector
+from pgvector import MAX_CANDIDATES, VectorDB
+
+
+class FakeCursor:
+    """
+    Returns the movies passing the filters among the nearest n_candidates
+    chunks, where only chunks past the first shortlist pass.
+    """
+    def __init__(self, passing_after: int) -> None:
+        self.passing_after = passing_after
+        self.limits = []
+        self.rows = []
+
+    def execute(self, sql: str, params=None):
+        n_candidates = params[3]
+        self.limits.append(n_candidates)
+        self.rows = [
+            (chunk_id, f"movie {chunk_id}", 2001, ['horror'], 'description', 0.1,
+             n_candidates, 0.2, chunk_id)
+            for chunk_id in range(self.passing_after, n_candidates)
+        ][:params[4]]
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, cursor: FakeCursor) -> None:
+        self.cur = cursor
+
+    def cursor(self):
+        return self.cur
+
+
+def vector_db(monkeypatch, iterative_scan: bool) -> VectorDB:
+    monkeypatch.setattr(pgvector, 'ITERATIVE_SCAN_ACTIVE', iterative_scan)
+    monkeypatch.setattr(pgvector, 'set_search_params', lambda *args: None)
+    db = VectorDB.__new__(VectorDB)
+    monkeypatch.setattr(db, 'estimate_selectivity', lambda *args: 0.5)
+    monkeypatch.setattr(db, 'prepare_statements', lambda *args: ['search', 'search_exact'])
+    return db
+
+
+def search(db: VectorDB, cur: FakeCursor, k: int = 5) -> list:
+    return db.vector_rows(
+        FakeConnection(cur), 'fixed-size-splitter', 'all-MiniLM-L6-v2', np.zeros(384),
+        {'min_year': '2000', 'max_year': '2010', 'genre': 'horror'}, k, 0.0,
+        filter_strategy='ann'
+    )
+
+
+def test_empty_ann_shortlist_is_widened(monkeypatch):
+    db = vector_db(monkeypatch, iterative_scan=False)
+    cur = FakeCursor(passing_after=100)
+
+    results = search(db, cur)
+
+    assert len(results) == 5
+    assert cur.limits[0] < 100 < cur.limits[-1] <= MAX_CANDIDATES
+
+
+def test_empty_iterative_scan_is_final(monkeypatch):
+    db = vector_db(monkeypatch, iterative_scan=True)
+    cur = FakeCursor(passing_after=100)
+
+    assert search(db, cur) == []
+    assert len(cur.limits) == 1
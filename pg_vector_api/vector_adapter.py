@@ -0,0 +1,22 @@
+import numpy as np
+from psycopg2.extensions import AsIs, register_adapter
+
+
+def format_vector(vector) -> str:
+    """
+    pgvector text form of a vector. float32 values are printed with their
+    shortest round-trip repr, which keeps statements about half the size
+    of formatting Python floats.
+    """
+    return "[" + ",".join(np.asarray(vector, dtype=np.float32).astype(str)) + "]"
+
+
+def adapt_vector(vector: np.ndarray) -> AsIs:
+    return AsIs(f"'{format_vector(vector)}'::vector")
+
+
+def register_vector_adapter():
+    """
+    Lets numpy arrays be passed directly as query parameters.
+    """
+    register_adapter(np.ndarray, adapt_vector)
@@ -0,0 +1,387 @@
+"""
+Chunks the movies dataset and writes the binary embedding store used by
+pg_vector_api (see pg_vector_api/embedding_store.py) for every chunking
+strategy and embedding model:
+
+    <output>/<strategy>/<model>/vectors.npy       float32 (n_chunks, dim)
+    <output>/<strategy>/<model>/metadata.parquet  title, year, genres, description
+
+Movies are read lazily in batches and streamed through chunking and
+encoding, and the rows kept from the previous store are copied batch by
+batch, so apart from the (title, year) -> source hash map of the dataset
+memory stays flat with its size. Fixed-size and recursive chunks are split
+on a process pool (--chunk-workers), semantic chunks embed the sentences of
+a whole batch at once. Every window of chunks
+is sorted by length so batches need little padding, encoded in batches of
+--batch-size on a multi-process pool and appended to the store.
+
+Every chunk row keeps the source hash of its movie, so later runs chunk
+and embed only new or changed movies and copy the rest from the previous
+store.
+
+python -m scripts.build_embeddings --dataset data/valid_data.csv --output pg_vector_api/embeddings
+"""
+import argparse
+import ast
+import collections
+import hashlib
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sentence_transformers import SentenceTransformer
+from tqdm import tqdm
+
+from scripts.chunking_strategies import chunking_batch
+from scripts.hg_embeddings_connector import EMBED_BATCH_SIZE
+
+# 0 encodes in the calling process
+EMBED_WORKERS = int(os.getenv('EMBED_WORKERS', '4'))
+# texts encoded and written per step, bounds the memory of a run
+EMBED_WINDOW = int(os.getenv('EMBED_WINDOW', '8192'))
+# processes splitting fixed-size and recursive chunks, 0 splits in the calling process
+CHUNK_WORKERS = int(os.getenv('CHUNK_WORKERS', str(os.cpu_count() or 1)))
+# movies read from the dataset and chunked per step
+MOVIE_BATCH_ROWS = int(os.getenv('MOVIE_BATCH_ROWS', '1024'))
+
+CHUNKING_STRATEGIES = [
+    'fixed-size-splitter',
+    'recursive-splitter',
+    'semantic-splitter'
+]
+EMBEDDING_MODELS = [
+    'all-MiniLM-L6-v2',
+    'bert-base-nli-mean-tokens',
+    'gtr-t5-base'
+]
+STORE_COLUMNS = ['title', 'year', 'genres', 'description', 'source_hash']
+# columns of the previous store needed to diff it against the dataset
+KEY_COLUMNS = ['title', 'year', 'source_hash']
+METADATA_SCHEMA = pa.schema([
+    ('title', pa.string()),
+    ('year', pa.int64()),
+    ('genres', pa.list_(pa.string())),
+    ('description', pa.string()),
+    ('source_hash', pa.string())
+])
+GENRES_PATH = os.path.join(os.path.dirname(__file__), 'genres.txt')
+
+
+def load_genres(path: str = GENRES_PATH) -> set:
+    with open(path, 'r') as f:
+        return {genre.strip() for genre in f.readlines() if genre.strip()}
+
+
+def clean_genres(genres_list: list, genres: set) -> list:
+    cleaned_genres = []
+    for g in genres_list:
+        g = g.lower().replace("'", "").replace("-", "_").replace(" ", "_")
+        if "&" in g:
+            g = [genre.strip() for genre in g.split('&')]
+            cleaned_genres.extend([genre for genre in g if genre in genres])
+        elif g in genres:
+            cleaned_genres.append(g)
+    return cleaned_genres
+
+
+def movie_source_hash(title: str, year, genres: list, description: str) -> str:
+    return hashlib.sha256(
+        "\x1f".join([str(title), str(year), ",".join(genres), str(description)]).encode()
+    ).hexdigest()
+
+
+def iter_movies(path: str, keys: set = None, batch_rows: int = MOVIE_BATCH_ROWS):
+    """
+    Reads the dataset lazily, batch_rows movies at a time, optionally only
+    the movies whose (title, year) is in keys.
+    """
+    genres = load_genres()
+    for df in pd.read_csv(path, chunksize=batch_rows):
+        df['genres'] = df['genres'].apply(ast.literal_eval).apply(lambda g: clean_genres(g, genres))
+        df['source_hash'] = [
+            movie_source_hash(title, year, g, description)
+            for title, year, g, description in zip(df['title'], df['year'], df['genres'], df['description'])
+        ]
+        if keys is not None:
+            df = df[[key in keys for key in zip(df['title'], df['year'])]]
+        if len(df):
+            yield df[STORE_COLUMNS].reset_index(drop=True)
+
+
+def movie_hashes(path: str) -> dict:
+    """
+    (title, year) -> source hash of every movie of the dataset.
+    """
+    return {
+        key: source_hash
+        for df in iter_movies(path)
+        for key, source_hash in zip(zip(df['title'], df['year']), df['source_hash'])
+    }
+
+
+def explode_chunks(df: pd.DataFrame, chunks: list) -> pd.DataFrame:
+    """
+    One row per chunk with the metadata of its movie.
+    """
+    return df.assign(description=chunks).explode('description') \
+        .dropna(subset=['description']).reset_index(drop=True)
+
+
+def iter_chunks(movies, chunking_strategy: str, embedder: SentenceTransformer, executor=None):
+    """
+    Chunks every batch of movies. Fixed-size and recursive batches are
+    split on the process pool with a bounded number of batches in flight;
+    semantic batches are split here with batched sentence embeddings.
+    """
+    if executor is None or chunking_strategy == 'semantic-splitter':
+        for df in movies:
+            yield explode_chunks(df, chunking_batch(chunking_strategy, df['description'].tolist(), embedder))
+        return
+    pending = collections.deque()
+    for df in movies:
+        pending.append((df, executor.submit(chunking_batch, chunking_strategy, df['description'].tolist())))
+        if len(pending) > 2 * CHUNK_WORKERS:
+            df, future = pending.popleft()
+            yield explode_chunks(df, future.result())
+    while pending:
+        df, future = pending.popleft()
+        yield explode_chunks(df, future.result())
+
+
+def iter_windows(chunks, window: int = EMBED_WINDOW):
+    """
+    Regroups chunk batches into windows of about window rows.
+    """
+    batches, rows = [], 0
+    for df in chunks:
+        batches.append(df)
+        rows += len(df)
+        if rows >= window:
+            yield pd.concat(batches, ignore_index=True)
+            batches, rows = [], 0
+    if batches:
+        yield pd.concat(batches, ignore_index=True)
+
+
+def encode(
+        model: SentenceTransformer,
+        texts: list,
+        batch_size: int,
+        pool: dict = None) -> np.ndarray:
+    if pool is None:
+        return model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    return model.encode_multi_process(texts, pool, batch_size=batch_size)
+
+
+def encode_window(
+        model: SentenceTransformer,
+        texts: list,
+        batch_size: int,
+        pool: dict = None) -> np.ndarray:
+    """
+    Encodes the texts in length order so batches need little padding and
+    returns their vectors in input order.
+    """
+    order = np.argsort([len(text) for text in texts], kind='stable')
+    vectors = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    vectors[order] = encode(model, [texts[i] for i in order], batch_size, pool)
+    return vectors
+
+
+def write_store(store_dir: str, dims: int, parts) -> int:
+    """
+    Writes (metadata, vectors) parts as they come: vectors are appended to
+    a raw file and metadata to a Parquet writer, the .npy is assembled once
+    the row count is known. The new files replace the old ones only when
+    complete. Returns the number of rows.
+    """
+    vectors_path = os.path.join(store_dir, 'vectors.npy')
+    metadata_path = os.path.join(store_dir, 'metadata.parquet')
+    rows = 0
+    writer = pq.ParquetWriter(metadata_path + '.tmp', METADATA_SCHEMA)
+    try:
+        with open(vectors_path + '.raw', 'wb') as raw:
+            for metadata, vectors in parts:
+                raw.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                writer.write_table(pa.Table.from_pandas(
+                    metadata[STORE_COLUMNS], schema=METADATA_SCHEMA, preserve_index=False
+                ))
+                rows += len(metadata)
+    finally:
+        writer.close()
+    with open(vectors_path + '.tmp', 'wb') as f, open(vectors_path + '.raw', 'rb') as raw:
+        np.lib.format.write_array_header_1_0(f, {
+            'descr': np.lib.format.dtype_to_descr(np.dtype(np.float32)),
+            'fortran_order': False,
+            'shape': (rows, dims)
+        })
+        shutil.copyfileobj(raw, f, 1 << 20)
+    os.remove(vectors_path + '.raw')
+    os.replace(vectors_path + '.tmp', vectors_path)
+    os.replace(metadata_path + '.tmp', metadata_path)
+    return rows
+
+
+def load_existing(store_dir: str) -> tuple:
+    """
+    Title, year and source hash of every chunk of a store written by this
+    script and its memory-mapped vectors, (None, None) when there is none
+    or it has no per-movie source hashes. The other columns are copied
+    from the file in batches when the store is rewritten.
+    """
+    vectors_path = os.path.join(store_dir, 'vectors.npy')
+    metadata_path = os.path.join(store_dir, 'metadata.parquet')
+    if not (os.path.exists(vectors_path) and os.path.exists(metadata_path)):
+        return None, None
+    if 'source_hash' not in pq.read_schema(metadata_path).names:
+        return None, None
+    return pd.read_parquet(metadata_path, columns=KEY_COLUMNS), np.load(vectors_path, mmap_mode='r')
+
+
+def iter_kept(metadata_path: str, vectors: np.ndarray, keep: np.ndarray, batch_rows: int = EMBED_WINDOW):
+    """
+    (metadata, vectors) of the kept rows of a store, read batch_rows rows
+    of its metadata at a time.
+    """
+    offset = 0
+    for batch in pq.ParquetFile(metadata_path).iter_batches(batch_size=batch_rows, columns=STORE_COLUMNS):
+        rows = keep[(keep >= offset) & (keep < offset + batch.num_rows)]
+        if len(rows):
+            yield batch.to_pandas().iloc[rows - offset].reset_index(drop=True), vectors[rows]
+        offset += batch.num_rows
+
+
+def diff_movies(current: dict, existing: pd.DataFrame) -> dict:
+    """
+    Source hashes of the dataset against the ones the store was built from.
+    """
+    built = {} if existing is None else dict(zip(
+        zip(existing['title'], existing['year']), existing['source_hash']
+    ))
+    return {
+        'added': {key for key in current if key not in built},
+        'changed': {key for key in current if key in built and built[key] != current[key]},
+        'removed': {key for key in built if key not in current},
+        'unchanged': {key for key in current if built.get(key) == current[key]}
+    }
+
+
+def update_store(
+        dataset: str,
+        current: dict,
+        store_dir: str,
+        chunking_strategy: str,
+        model: SentenceTransformer,
+        batch_size: int,
+        pool: dict = None,
+        executor=None) -> dict:
+    """
+    Rewrites one store keeping the chunks and vectors of unchanged movies
+    and streaming only new and changed ones from the dataset through
+    chunking and encoding. Returns the diff summary.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    existing, existing_vectors = load_existing(store_dir)
+    diff = diff_movies(current, existing)
+    keep = np.array([], dtype=np.int64)
+    if existing is not None:
+        keep = np.flatnonzero([
+            key in diff['unchanged'] for key in zip(existing['title'], existing['year'])
+        ])
+    summary = {name: len(movies) for name, movies in diff.items()}
+    summary['embedded_chunks'] = 0
+    encode_seconds = 0.0
+
+    def parts():
+        nonlocal encode_seconds
+        if len(keep):
+            yield from iter_kept(os.path.join(store_dir, 'metadata.parquet'), existing_vectors, keep)
+        movies = iter_movies(dataset, diff['added'] | diff['changed'])
+        windows = iter_windows(iter_chunks(movies, chunking_strategy, model, executor))
+        for window in tqdm(windows, desc=f"{chunking_strategy} windows"):
+            start = time.perf_counter()
+            vectors = encode_window(model, window['description'].tolist(), batch_size, pool)
+            encode_seconds += time.perf_counter() - start
+            summary['embedded_chunks'] += len(window)
+            yield window, vectors
+
+    write_store(store_dir, model.get_sentence_embedding_dimension(), parts())
+    summary['chunks_per_sec'] = summary['embedded_chunks'] / max(encode_seconds, 1e-9)
+    return summary
+
+
+def build_store(
+        dataset: str,
+        output: str,
+        chunking_strategies: list,
+        embedding_models: list,
+        batch_size: int = EMBED_BATCH_SIZE,
+        workers: int = EMBED_WORKERS,
+        chunk_workers: int = CHUNK_WORKERS) -> dict:
+    """
+    Updates the store of every strategy/model pair. Returns the diff
+    summary with chunks/sec per pair.
+    """
+    current = movie_hashes(dataset)
+    summaries = {}
+    executor = None
+    if chunk_workers > 1:
+        executor = ProcessPoolExecutor(chunk_workers, mp_context=multiprocessing.get_context('spawn'))
+    try:
+        for embedding_model in embedding_models:
+            model = SentenceTransformer(embedding_model)
+            pool = model.start_multi_process_pool(['cpu'] * workers) if workers > 1 else None
+            try:
+                for chunking_strategy in chunking_strategies:
+                    summary = update_store(
+                        dataset, current, os.path.join(output, chunking_strategy, embedding_model),
+                        chunking_strategy, model, batch_size, pool, executor
+                    )
+                    summaries[(chunking_strategy, embedding_model)] = summary
+                    print(
+                        f"{chunking_strategy}/{embedding_model}: +{summary['added']} added "
+                        f"~{summary['changed']} changed -{summary['removed']} removed "
+                        f"={summary['unchanged']} unchanged movies, "
+                        f"{summary['embedded_chunks']} chunks embedded at {summary['chunks_per_sec']:.1f} chunks/sec"
+                    )
+            finally:
+                if pool is not None:
+                    model.stop_multi_process_pool(pool)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dataset', default='data/valid_data.csv')
+    parser.add_argument('--output', default='pg_vector_api/embeddings')
+    parser.add_argument('--strategies', nargs='+', default=list(CHUNKING_STRATEGIES))
+    parser.add_argument('--models', nargs='+', default=EMBEDDING_MODELS)
+    parser.add_argument('--batch-size', type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=EMBED_WORKERS)
+    parser.add_argument('--chunk-workers', type=int, default=CHUNK_WORKERS)
+    args = parser.parse_args()
+
+    summaries = build_store(
+        args.dataset, args.output, args.strategies, args.models,
+        args.batch_size, args.workers, args.chunk_workers
+    )
+    for embedding_model in args.models:
+        rates = [
+            summary['chunks_per_sec'] for (_, model), summary in summaries.items()
+            if model == embedding_model and summary['embedded_chunks'] > 0
+        ]
+        if rates:
+            print(f"{embedding_model}: {np.mean(rates):.1f} chunks/sec")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,32 +1,83 @@
+import functools
+import re
+
 from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
-from langchain_experimental.text_splitter import SemanticChunker
+from langchain_experimental.text_splitter import SemanticChunker, combine_sentences
 from sentence_transformers import SentenceTransformer
-from scripts.hg_embeddings_connector import CustomEmbedder
+from scripts.hg_embeddings_connector import CachedEmbedder
+
+# sentence split used by SemanticChunker
+SENTENCE_SPLIT_REGEX = r"(?<=[.?!])\s+"
+
+
+@functools.lru_cache(maxsize=None)
+def fixed_size_splitter() -> CharacterTextSplitter:
+    return CharacterTextSplitter(
+        separator="\n",
+        chunk_size=1024,
+        chunk_overlap=20
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def recursive_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=1024,
+        chunk_overlap=20,
+        length_function=len,
+        is_separator_regex=False,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def semantic_splitter(embedder: SentenceTransformer) -> SemanticChunker:
+    return SemanticChunker(CachedEmbedder(embedder))
 
 
 def fixed_size_chunking(description: str, embedder: SentenceTransformer) -> list:
-    text_splitter = CharacterTextSplitter(
-                        separator="\n",
-                        chunk_size=1024,
-                        chunk_overlap=20
-                    )
-    docs = text_splitter.split_text(description)
-    return docs
+    return fixed_size_splitter().split_text(description)
 
 
 def semantic_chunking(description: str, embedder: SentenceTransformer) -> list:
-    emb = CustomEmbedder(embedder)
-    text_splitter = SemanticChunker(emb)
-    docs = text_splitter.split_text(description)
-    return docs
+    return semantic_splitter(embedder).split_text(description)
 
 
 def recursive_chunking(description: str, embedder: SentenceTransformer) -> list:
-    text_splitter = RecursiveCharacterTextSplitter(
-                                chunk_size=1024,
-                                chunk_overlap=20,
-                                length_function=len,
-                                is_separator_regex=False,
-                            )
-    docs = text_splitter.split_text(description)
-    return docs
+    return recursive_splitter().split_text(description)
+
+
+def combined_sentences(description: str, splitter: SemanticChunker) -> list:
+    """
+    Texts SemanticChunker embeds to split the description.
+    """
+    regex = getattr(splitter, 'sentence_split_regex', SENTENCE_SPLIT_REGEX)
+    sentences = [{'sentence': s, 'index': i} for i, s in enumerate(re.split(regex, description))]
+    if len(sentences) == 1:
+        return []
+    return [s['combined_sentence'] for s in combine_sentences(sentences, getattr(splitter, 'buffer_size', 1))]
+
+
+def semantic_chunking_batch(descriptions: list, embedder: SentenceTransformer) -> list:
+    """
+    Semantic chunks of many descriptions, the sentence embeddings of all of
+    them are encoded in one batched call instead of one call per description.
+    """
+    splitter = semantic_splitter(embedder)
+    splitter.embeddings.prefetch([
+        text for description in descriptions for text in combined_sentences(description, splitter)
+    ])
+    try:
+        return [splitter.split_text(description) for description in descriptions]
+    finally:
+        splitter.embeddings.clear()
+
+
+def chunking_batch(chunking_strategy: str, descriptions: list, embedder: SentenceTransformer = None) -> list:
+    """
+    Chunks of every description, a list per description. Fixed-size and
+    recursive splitting need no embedder and run in pool workers.
+    """
+    if chunking_strategy == 'semantic-splitter':
+        return semantic_chunking_batch(descriptions, embedder)
+    splitter = fixed_size_splitter() if chunking_strategy == 'fixed-size-splitter' else recursive_splitter()
+    return [splitter.split_text(description) for description in descriptions]
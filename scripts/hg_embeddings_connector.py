@@ -1,13 +1,46 @@
+import os
+
+EMBED_BATCH_SIZE = int(os.getenv('EMBED_BATCH_SIZE', '64'))
+
+
 class CustomEmbedder:
-    def __init__(self, embedder) -> None:
+    def __init__(self, embedder, batch_size: int = EMBED_BATCH_SIZE) -> None:
         self.embedder = embedder
+        self.batch_size = batch_size
 
     def get_embedding(self, text: str) -> list:
         embeddings = self.embedder.encode(text, convert_to_tensor=False)
         return embeddings.tolist()
 
     def embed_documents(self, documents: list) -> list:
-        return [self.get_embedding(doc) for doc in documents]
+        embeddings = self.embedder.encode(
+                                    documents,
+                                    batch_size=self.batch_size,
+                                    convert_to_tensor=False
+                                    )
+        return embeddings.tolist()
 
     def embed_query(self, query: str) -> list:
         return self.get_embedding(query)
+
+
+class CachedEmbedder(CustomEmbedder):
+    """
+    Serves embed_documents from embeddings prefetched in one batched
+    encode, texts that were not prefetched are encoded on demand.
+    """
+    def __init__(self, embedder, batch_size: int = EMBED_BATCH_SIZE) -> None:
+        super().__init__(embedder, batch_size)
+        self.cache = {}
+
+    def prefetch(self, documents: list):
+        missing = list(dict.fromkeys(d for d in documents if d not in self.cache))
+        if missing:
+            self.cache.update(zip(missing, super().embed_documents(missing)))
+
+    def clear(self):
+        self.cache = {}
+
+    def embed_documents(self, documents: list) -> list:
+        self.prefetch(documents)
+        return [self.cache[d] for d in documents]
@@ -1,3 +1,4 @@
+import json
 import os
 
 import requests
@@ -23,12 +24,13 @@ def extract_metadata(query: str) -> dict:
         return {"error": f"An error occurred: {str(e)}"}
 
 
-def generate_reasoning(title: str, description: str, query: str) -> dict:
+def generate_reasoning(title: str, description: str, query: str, language: str = 'en') -> dict:
     url = f"{os.getenv('LLM_API')}/generate_reasoning"
     body = {
         "title": title,
         "query": query,
         "description": description,
+        "language": language,
         "parameters": {}
     }
     try:
@@ -42,6 +44,62 @@ def generate_reasoning(title: str, description: str, query: str) -> dict:
         return {"error": f"An error occurred: {str(e)}"}
 
 
+def stream_reasoning(title: str, description: str, query: str, language: str = 'en'):
+    """
+    Yields the reasoning piece by piece from the Server-Sent Events of the
+    LLM API, errors are yielded as text.
+    """
+    url = f"{os.getenv('LLM_API')}/generate_reasoning/stream"
+    body = {
+        "title": title,
+        "query": query,
+        "description": description,
+        "language": language
+    }
+    try:
+        with requests.post(url, json=body, stream=True) as response:
+            if response.status_code != 200:
+                yield f"Request failed with status code {response.status_code}"
+                return
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    return
+                event = json.loads(data)
+                if 'error' in event:
+                    yield f"An error occurred: {event['error']}"
+                    return
+                yield event['token']
+    except Exception as e:
+        yield f"An error occurred: {str(e)}"
+
+
+def prefetch_reasoning(movies: list, query: str, language: str = 'en') -> dict:
+    """
+    Asks the LLM API to start generating reasoning for (title, description)
+    pairs in the background, returns without waiting for them.
+    """
+    url = f"{os.getenv('LLM_API')}/prefetch_reasoning"
+    body = {
+        "query": query,
+        "language": language,
+        "movies": [
+            {"title": title, "description": description} for title, description in movies
+        ]
+    }
+    try:
+        response = requests.post(url, json=body, timeout=5)
+        if response.status_code == 200:
+            return response.json()
+        return {"error":
+                f"Request failed with status code {response.status_code}"
+                }
+    except Exception as e:
+        return {"error": f"An error occurred: {str(e)}"}
+
+
 def translate(text: str, src_lang: str, tgt_lang: str):
     url = f"{os.getenv('TRANSLATOR')}/translate"
     body = {
@@ -66,7 +124,8 @@ def search_movies(
         query: str,
         metadata: dict,
         k: int,
-        min_similarity_score: float) -> dict:
+        min_similarity_score: float,
+        search_mode: str = 'vector') -> dict:
     url = f"{os.getenv('DB_API')}/search_movies"
     body = {
         "chunking_strategy": chunking_strategy,
@@ -74,7 +133,8 @@ def search_movies(
         "query": query,
         "metadata": metadata,
         "k": k,
-        "min_similarity_score": min_similarity_score
+        "min_similarity_score": min_similarity_score,
+        "search_mode": search_mode
     }
     try:
         response = requests.post(url, json=body)
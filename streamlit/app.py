@@ -6,16 +6,24 @@ import pandas as pd
 from dotenv import load_dotenv
 
 import streamlit as st
-from api_requests import extract_metadata, generate_reasoning, translate, is_db_api_alive
+from api_requests import (extract_metadata, generate_reasoning, prefetch_reasoning,
+                          stream_reasoning, translate, is_db_api_alive)
 from utils import streamlit_search_movies, remove_emojis, count_empty_tables_proportion
 import time
 
 load_dotenv()
 
+# upcoming results whose reasoning is generated while the current one is read
+REASONING_PREFETCH = int(os.getenv('REASONING_PREFETCH', '3'))
+
 
 @st.cache_data
 def load_data():
     DATASET = os.getenv('DATASET')
+    if DATASET.endswith('.parquet'):
+        df = pd.read_parquet(DATASET, memory_map=True)
+        df['genres'] = df['genres'].map(list)
+        return df
     df = pd.read_csv(DATASET)
     df['genres'] = df['genres'].apply(ast.literal_eval)
     return df
@@ -80,31 +88,40 @@ def display_movies(
 
     st.write(text)
 
-    with st.spinner('Generating reasoning...'):
-        reasoning = generate_reasoning(
-            movie['title'], rag_description, query
-            )
-        if 'generated_response' not in reasoning:
-            reasoning = {'generated_response': None}
-
-        text = "**🤖AI Reasoning**\n\n"
-        reasoning = translate(
-            text=reasoning['generated_response'],
-            src_lang="en",
-            tgt_lang=remove_emojis(language)
-        )['translation']
-        text += reasoning
-
-        found_text = "Movie is found!"
-        found_text = translate(
-            text=found_text,
-            src_lang="eng",
-            tgt_lang=remove_emojis(language)
-        )['translation']
-        st.success(found_text)
+    found_text = "Movie is found!"
+    found_text = translate(
+        text=found_text,
+        src_lang="eng",
+        tgt_lang=remove_emojis(language)
+    )['translation']
+    st.success(found_text)
 
-        st.write(text)
-        st.write("---")
+    st.write("**🤖AI Reasoning**")
+    if remove_emojis(language) == 'en':
+        # no translation needed, tokens are shown as they are generated
+        st.write_stream(stream_reasoning(movie['title'], rag_description, query))
+    else:
+        with st.spinner('Generating reasoning...'):
+            reasoning = generate_reasoning(
+                movie['title'], rag_description, query
+                )
+            if 'generated_response' not in reasoning:
+                reasoning = {'generated_response': None}
+
+            reasoning = translate(
+                text=reasoning['generated_response'],
+                src_lang="en",
+                tgt_lang=remove_emojis(language)
+            )['translation']
+            st.write(reasoning)
+    st.write("---")
+
+    # after the current reasoning, so upcoming ones do not take its LLM slot
+    upcoming = movies.iloc[counter+1:counter+1+REASONING_PREFETCH]
+    if len(upcoming) > 0:
+        prefetch_reasoning(
+            list(zip(upcoming['title'], upcoming['rag_description'])), query
+            )
 
     if st.button(f'Show Next ({counter+1}/{len(movies)})', key=f"show_more_{counter}"):
         st.session_state['counter'] = counter+1
@@ -132,6 +149,13 @@ def main():
                                                 'gtr-t5-base'
                                                 ]
                                                 )
+    search_mode = st.sidebar.selectbox(
+                                        'Select Search mode',
+                                        [
+                                            'vector',
+                                            'hybrid'
+                                            ]
+                                            )
     language = st.sidebar.selectbox(
                                         'Select Generation Output Language',
                                         [
@@ -186,7 +210,8 @@ def main():
             except Exception:
                 metadata = {}
             movies = streamlit_search_movies(
-                chunking_strategy, embedding_model, search_query, metadata
+                chunking_strategy, embedding_model, search_query, metadata,
+                search_mode=search_mode
                 )
 
         if len(movies) > 0:
@@ -10,7 +10,8 @@ def streamlit_search_movies(
         embedding_model: str,
         query: str,
         metadata: dict,
-        k=10, min_similarity_score=0) -> pd.DataFrame:
+        k=10, min_similarity_score=0,
+        search_mode='vector') -> pd.DataFrame:
 
     result = search_movies(
         chunking_strategy=chunking_strategy,
@@ -18,7 +19,8 @@ def streamlit_search_movies(
         query=query,
         metadata=metadata,
         k=k,
-        min_similarity_score=min_similarity_score)
+        min_similarity_score=min_similarity_score,
+        search_mode=search_mode)
     result = result['search_results']
 
     data = pd.DataFrame(columns=['title', 'year', 'genres', 'rag_description'])
@@ -66,20 +68,13 @@ def count_empty_tables_proportion() -> float:
     ]
     conn = init_db()
     k_tables = len(CHUNKING_STRATEGIES) * len(EMBEDDING_MODELS)
-    counter = 0
+    counter = k_tables - count_completed_tables(conn)
+    conn.close()
+    return round(max(counter, 0)/k_tables, 2)
 
-    for chunking_strategy in CHUNKING_STRATEGIES:
-        for embedding_model in EMBEDDING_MODELS:
-            table_name = f"{chunking_strategy.lower().replace('-', '_')}_{embedding_model.lower().replace('-', '_')}"
-            n = count_rows(conn, table_name)
 
-            if n < 10:
-                counter += 1
-    return round(counter/k_tables, 2)
-
-
-def count_rows(conn, table_name: str) -> int:
-    sql = f"SELECT COUNT(*) FROM {table_name}"
+def count_completed_tables(conn) -> int:
+    sql = "SELECT COUNT(*) FROM population_checkpoints WHERE completed"
     cur = conn.cursor()
     cur.execute(sql)
     row_count = cur.fetchone()[0]